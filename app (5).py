@@ -2,18 +2,48 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import numpy as np
 from datetime import datetime, timedelta
 import json
 import uuid
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, List
+import hashlib
+import importlib.machinery
+import io
+import multiprocessing
+import os
 import re
+import threading
+import time
+import weakref
+import zlib
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial, reduce
 
-# Try to import Excel processor (optional enhanced feature)
+# Copy-on-Write makes shallow copies behave as read-only views (always on in pandas >= 3)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Workbook processing and FAQ column detection
+from excel_processor import WORKBOOK_EXTENSIONS, ExcelProcessor, parse_kb_file
+from knowledge_base import KnowledgeBaseStore
+from language_detection import detect_language, detect_many
+
+# Streamlit runs each script run in a fresh, spec-less __main__ module, which
+# new parse worker processes (see get_parse_pool) would re-run by path before
+# taking tasks; a __main__ whose spec is named '__main__' is left alone
+if __spec__ is None:
+    __spec__ = importlib.machinery.ModuleSpec('__main__', None)
+
+# Columnar sidecar cache for parsed datasets (pyarrow ships with streamlit)
 try:
-    from excel_processor import ExcelProcessor
-    EXCEL_PROCESSOR_AVAILABLE = True
-except:
-    EXCEL_PROCESSOR_AVAILABLE = False
+    import pyarrow.feather as feather
+    COLUMNAR_CACHE_AVAILABLE = True
+except ImportError:
+    COLUMNAR_CACHE_AVAILABLE = False
 
 # Page configuration
 st.set_page_config(
@@ -67,8 +97,12 @@ if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 if 'tickets' not in st.session_state:
     st.session_state.tickets = []
-if 'knowledge_base' not in st.session_state:
-    st.session_state.knowledge_base = {}
+if 'ingestion_jobs' not in st.session_state:
+    st.session_state.ingestion_jobs = {}
+# Settings widgets are keyed to these; assigning them on every run keeps
+# their values while the Settings page (and so the widget) isn't shown
+st.session_state.semantic_matching = st.session_state.get('semantic_matching', False)
+st.session_state.confidence_threshold = st.session_state.get('confidence_threshold', 0.7)
 
 def show_dataset_upload_help():
     """Show helpful message when dataset is not loaded"""
@@ -107,26 +141,507 @@ def show_dataset_upload_help():
         - query_date
         """)
 
-# Load dataset (not cached to allow dynamic loading from session state)
+# Dataset store: parsed datasets are kept per source fingerprint so reruns
+# reuse the same frame instead of copying or re-parsing it
+DEFAULT_DATASET_PATHS = [
+    'Few_Data_set.xlsx',
+    '/mnt/user-data/uploads/Few_Data_set.xlsx',
+    './Few_Data_set.xlsx'
+]
+
+# Uploads have no source directory, so their sidecars live here
+DATASET_CACHE_DIR = os.environ.get('DATASET_CACHE_DIR', '.dataset_cache')
+# Upload sidecars kept on disk; the least recently used beyond this are deleted
+MAX_UPLOAD_CACHES = int(os.environ.get('MAX_UPLOAD_CACHES', 8))
+
+# Columns the app reads; anything else in a dataset workbook is dropped at load
+DATASET_COLUMNS = [
+    'record_id', 'business_unit', 'customer_query', 'query_category', 'language',
+    'communication_channel', 'ai_response', 'ticket_created', 'query_date'
+]
+# Low-cardinality columns stored as categoricals
+CATEGORICAL_COLUMNS = ['business_unit', 'communication_channel', 'language', 'query_category']
+DAY_OF_WEEK_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+TRUE_FLAGS = ['yes', 'y', 'true', '1']
+# Bump whenever prepare_dataset changes so sidecars from older code are ignored
+DATASET_SCHEMA_VERSION = 2
+
+def file_fingerprint(path: str) -> str:
+    """Cheap fingerprint for path-based datasets (changes when the file is rewritten)"""
+    stat = os.stat(path)
+    return f"file:{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+
+def bytes_fingerprint(data: bytes) -> str:
+    """Content hash for uploaded datasets"""
+    return f"sha1:{hashlib.sha1(data).hexdigest()}"
+
+def parse_yes_no(series: pd.Series) -> pd.Series:
+    """Map Yes/No style flags to booleans (anything unrecognized counts as No)"""
+    if series.dtype == bool:
+        return series
+    return series.astype(str).str.strip().str.lower().isin(TRUE_FLAGS)
+
+def prepare_dataset(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize a freshly parsed dataset (runs once per source, chunk by chunk):
+    unused columns are dropped, missing languages are detected from the
+    query text, low-cardinality text becomes categorical, ticket_created
+    becomes a boolean and day_of_week is derived once.
+    """
+    df = df[[col for col in DATASET_COLUMNS if col in df.columns]]
+    if 'customer_query' in df.columns:
+        if 'language' not in df.columns:
+            df['language'] = detect_many(df['customer_query'])
+        elif df['language'].isna().any():
+            missing = df['language'].isna()
+            df['language'] = df['language'].fillna(
+                pd.Series(detect_many(df.loc[missing, 'customer_query']), index=df.index[missing])
+            )
+    if 'query_date' in df.columns:
+        df['query_date'] = pd.to_datetime(df['query_date'])
+        df['day_of_week'] = pd.Categorical(
+            df['query_date'].dt.day_name(),
+            categories=DAY_OF_WEEK_ORDER,
+            ordered=True
+        )
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    if 'ticket_created' in df.columns:
+        df['ticket_created'] = parse_yes_no(df['ticket_created'])
+    return df
+
+def concat_dataset_chunks(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate prepared chunks; categoricals are unified first so they stay categorical"""
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0]
+    unified = []
+    categories = {
+        col: reduce(pd.Index.union, (chunk[col].cat.categories for chunk in chunks))
+        for col in CATEGORICAL_COLUMNS if col in chunks[0].columns
+    }
+    for chunk in chunks:
+        unified.append(chunk.assign(**{
+            col: chunk[col].cat.set_categories(cats) for col, cats in categories.items()
+        }))
+    return pd.concat(unified, ignore_index=True)
+
+def stream_dataset(source, name: str, container=st) -> pd.DataFrame:
+    """
+    Read and prepare a dataset workbook (or CSV) in fixed-size chunks.
+    Only the columns the app uses are read, and each chunk is prepared as it
+    arrives, so the raw sheet is never held in memory at once.
+    Progress is shown in `container` while reading.
+    """
+    progress_bar = container.progress(0.0, text=f"Loading {os.path.basename(name)}...")
+    chunks = []
+    rows = 0
+    try:
+        for chunk, progress in ExcelProcessor(source, name=name).iter_chunks(columns=DATASET_COLUMNS):
+            chunks.append(prepare_dataset(chunk))
+            rows += len(chunk)
+            if progress is not None:
+                progress_bar.progress(progress, text=f"Loading {os.path.basename(name)}... {rows:,} rows")
+    finally:
+        progress_bar.empty()
+    return concat_dataset_chunks(chunks)
+
+# Dimensions of the pre-aggregated metrics cube (plus the query day)
+CUBE_DIMENSIONS = ['business_unit', 'communication_channel', 'language', 'query_category', 'ticket_created']
+
+def build_metrics_cube(df: pd.DataFrame):
+    """
+    Pre-aggregate row counts per (date, business_unit, channel, language,
+    category, ticket_created). Charts are answered from the cube, so their
+    cost follows the number of distinct groups instead of the number of rows.
+    Returns None when the dataset lacks the required columns.
+    """
+    if df.empty or any(col not in df.columns for col in ['query_date'] + CUBE_DIMENSIONS):
+        return None
+    keys = [df['query_date'].dt.normalize().rename('date')] + [df[col] for col in CUBE_DIMENSIONS]
+    cube = df.groupby(keys, observed=True, dropna=False).size().rename('count').reset_index()
+    # Date order lets time windows resolve to a slice (see date_bounds)
+    cube = cube.sort_values('date', kind='stable', na_position='last', ignore_index=True)
+    cube['tickets'] = cube['count'].where(cube['ticket_created'], 0)
+    cube['day_of_week'] = pd.Categorical(
+        cube['date'].dt.day_name(),
+        categories=DAY_OF_WEEK_ORDER,
+        ordered=True
+    )
+    return cube
+
+TIME_PERIODS = ["Today", "Last 7 Days", "Last 30 Days", "All Time", "Custom Range", "Rolling Window"]
+
+def date_bounds(cube: pd.DataFrame, start=None, end=None) -> tuple:
+    """
+    Row range [lo, hi) of the date-sorted cube with start <= date < end,
+    found by binary search; cube.iloc[lo:hi] is a zero-copy slice.
+    Undated rows sort last and are only included when no bound is given.
+    """
+    dates = cube['date'].to_numpy()
+    if start is None and end is None:
+        return 0, len(dates)
+    lo = 0 if start is None else int(np.searchsorted(dates, pd.Timestamp(start).to_datetime64(), side='left'))
+    if end is None:
+        hi = int(np.searchsorted(dates, np.datetime64('NaT'), side='left'))
+    else:
+        hi = int(np.searchsorted(dates, pd.Timestamp(end).to_datetime64(), side='left'))
+    return lo, max(lo, hi)
+
+def select_time_window(cube: pd.DataFrame, key: str, period_col, options_col, default: str = "Today") -> tuple:
+    """
+    Render the Time Period controls and return the [start, end) dates they
+    select (None where unbounded); date_bounds gives the cube row range.
+    """
+    with period_col:
+        date_range = st.selectbox(
+            "Time Period",
+            TIME_PERIODS,
+            index=TIME_PERIODS.index(default),
+            key=f"{key}_time_period"
+        )
+    
+    today = pd.Timestamp.now().normalize()
+    if date_range == "Today":
+        return today, None
+    elif date_range == "Last 7 Days":
+        return today - timedelta(days=7), None
+    elif date_range == "Last 30 Days":
+        return today - timedelta(days=30), None
+    elif date_range == "Custom Range":
+        dated = cube['date'].dropna()
+        first = dated.iloc[0].date() if len(dated) else today.date()
+        last = dated.iloc[-1].date() if len(dated) else today.date()
+        with options_col:
+            picked = st.date_input(
+                "Date Range",
+                value=(first, last),
+                min_value=first,
+                max_value=last,
+                key=f"{key}_date_range"
+            )
+        # The widget returns a single date while the range is being picked
+        if not isinstance(picked, (tuple, list)):
+            picked = (picked,)
+        if len(picked) == 0:
+            return None, None
+        start = picked[0]
+        end = picked[1] if len(picked) > 1 else picked[0]
+        return pd.Timestamp(start), pd.Timestamp(end) + timedelta(days=1)
+    elif date_range == "Rolling Window":
+        with options_col:
+            window_days = st.number_input(
+                "Window (days)",
+                min_value=1,
+                max_value=3650,
+                value=14,
+                key=f"{key}_window_days"
+            )
+        return today - timedelta(days=int(window_days) - 1), None
+    return None, None
+
+def window_day_count(cube: pd.DataFrame, start=None, end=None) -> int:
+    """
+    Days in the time window [start, end) clamped to the dates the cube
+    actually covers (at least 1), for per-day averages over the window.
+    """
+    dated = cube['date'].dropna()
+    if dated.empty:
+        return 1
+    first, last = dated.iloc[0], dated.iloc[-1] + timedelta(days=1)
+    start = first if start is None else max(pd.Timestamp(start), first)
+    end = last if end is None else min(pd.Timestamp(end), last)
+    return max(1, (end - start).days)
+
+def cube_totals(cube: pd.DataFrame, dims, largest_first: bool = True) -> pd.DataFrame:
+    """Query and ticket totals per value of `dims` (largest first, or in key order)"""
+    totals = cube.groupby(dims, observed=True)[['count', 'tickets']].sum()
+    return totals.sort_values('count', ascending=False) if largest_first else totals
+
+def dimension_stats(frame: pd.DataFrame, dims: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Query/ticket totals and resolution/escalation rates per value of each of
+    `dims`, for the current filter. Works on the metrics cube ('count' and
+    'tickets' columns) or on raw rows (boolean ticket_created). Each dimension
+    is reduced with a weighted bincount over its categorical codes, so no
+    Python code runs per group.
+    """
+    if 'count' in frame.columns:
+        weights = frame['count'].to_numpy(dtype=float)
+        tickets = frame['tickets'].to_numpy(dtype=float)
+    else:
+        weights = np.ones(len(frame))
+        tickets = frame['ticket_created'].to_numpy(dtype=float)
+    
+    stats = {}
+    for dim in dims:
+        values = frame[dim]
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype('category')
+        codes = values.cat.codes.to_numpy()
+        valid = codes >= 0
+        size = len(values.cat.categories)
+        table = pd.DataFrame({
+            'count': np.bincount(codes[valid], weights=weights[valid], minlength=size).astype('int64'),
+            'tickets': np.bincount(codes[valid], weights=tickets[valid], minlength=size).astype('int64')
+        }, index=pd.Index(values.cat.categories, name=dim))
+        table = table[table['count'] > 0]
+        table['resolution_rate'] = (table['count'] - table['tickets']) / table['count'] * 100
+        table['escalation_rate'] = table['tickets'] / table['count'] * 100
+        stats[dim] = table
+    return stats
+
+# Dimensions of the Analytics multiselect filters
+FILTER_DIMENSIONS = ['business_unit', 'communication_channel', 'language', 'query_category']
+
+class FilterIndex:
+    """
+    Bitmap index over the rows of a frame (the metrics cube): one packed bitmap
+    per distinct value of each filter dimension, built once per dataset.
+    A filter selection resolves to an OR of bitmaps per dimension and an AND
+    across dimensions; resulting masks are cached per selection. Missing
+    values get a bitmap of their own, selected by NaN in the selection.
+    """
+    def __init__(self, frame: pd.DataFrame, dims: List[str], max_cached_masks: int = 64):
+        self._size = len(frame)
+        self._positions: Dict[str, Dict] = {}
+        self._bitmaps: Dict[str, np.ndarray] = {}
+        for dim in dims:
+            values = frame[dim]
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype('category')
+            codes = values.cat.codes.to_numpy()
+            self._positions[dim] = {value: i for i, value in enumerate(values.cat.categories)}
+            # Last row: missing values (code -1)
+            self._bitmaps[dim] = np.stack([
+                np.packbits(codes == i) for i in range(len(values.cat.categories))
+            ] + [np.packbits(codes == -1)])
+        self._masks: 'OrderedDict[tuple, np.ndarray]' = OrderedDict()
+        self._max_cached_masks = max_cached_masks
+        self._lock = threading.Lock()
+
+    def mask(self, selections: Dict[str, List]) -> np.ndarray:
+        """Boolean row mask equivalent to ANDing `isin(selected)` over each dimension"""
+        key = tuple(sorted((dim, frozenset(selected)) for dim, selected in selections.items()))
+        with self._lock:
+            cached = self._masks.get(key)
+            if cached is not None:
+                self._masks.move_to_end(key)
+                return cached
+        
+        packed = np.full((self._size + 7) // 8, 0xFF, dtype=np.uint8)
+        for dim, selected in selections.items():
+            positions = self._positions[dim]
+            rows = [-1 if pd.isna(value) else positions[value] for value in selected if pd.isna(value) or value in positions]
+            if not rows:
+                packed[:] = 0
+                break
+            packed &= np.bitwise_or.reduce(self._bitmaps[dim][rows], axis=0)
+        result = np.unpackbits(packed, count=self._size).astype(bool)
+        result.flags.writeable = False
+        
+        with self._lock:
+            self._masks[key] = result
+            if len(self._masks) > self._max_cached_masks:
+                self._masks.popitem(last=False)
+        return result
+
+def sidecar_cache_path(source_path: str, fingerprint: str) -> str:
+    """Path of the columnar cache for one version of a source file"""
+    directory = os.path.dirname(os.path.abspath(source_path)) if source_path else DATASET_CACHE_DIR
+    name = os.path.basename(source_path) if source_path else 'upload'
+    digest = hashlib.sha1(f"{DATASET_SCHEMA_VERSION}:{fingerprint}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(directory, f".{name}.{digest}.feather")
+
+def read_columnar_cache(cache_path: str):
+    """Memory-map a sidecar cache; returns None when missing or unreadable"""
+    if not COLUMNAR_CACHE_AVAILABLE or not os.path.isfile(cache_path):
+        return None
+    try:
+        table = feather.read_table(cache_path, memory_map=True)
+        df = table.to_pandas(split_blocks=True)
+    except Exception:
+        return None
+    try:
+        # Mark as recently used for the keep_recent pruning in write_columnar_cache
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return df
+
+def write_columnar_cache(df: pd.DataFrame, cache_path: str, prune_stale: bool = False, keep_recent: int = None):
+    """
+    Write an uncompressed (mmap-able) sidecar. Other sidecars of the same
+    source are then dropped: all of them with `prune_stale`, or all but the
+    `keep_recent` most recently used.
+    """
+    if not COLUMNAR_CACHE_AVAILABLE:
+        return
+    try:
+        directory = os.path.dirname(cache_path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+        feather.write_feather(df.reset_index(drop=True), tmp_path, compression='uncompressed')
+        os.replace(tmp_path, cache_path)
+        
+        if not prune_stale and keep_recent is None:
+            return
+        
+        # Older sidecars of the same source file can never be hit again;
+        # uploads have no source file, so only the most recent are kept
+        prefix = os.path.basename(cache_path).rsplit('.', 2)[0] + '.'
+        others = [
+            os.path.join(directory, entry) for entry in os.listdir(directory)
+            if entry.startswith(prefix) and entry.endswith('.feather') and entry != os.path.basename(cache_path)
+        ]
+        if not prune_stale:
+            others.sort(key=lambda path: os.path.getmtime(path), reverse=True)
+            others = others[max(0, keep_recent - 1):]
+        for path in others:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    except Exception:
+        # The cache is an optimization only; a failed write just means a slower next start
+        pass
+
+class DatasetHandle:
+    """
+    A session's reference to a dataset in the shared store.
+    Kept in st.session_state; the reference is released explicitly when the
+    session switches datasets, or when the session state is garbage collected.
+    """
+    def __init__(self, store: 'DatasetStore', fingerprint: str):
+        self.fingerprint = fingerprint
+        self._finalizer = weakref.finalize(self, store.release, fingerprint)
+
+    def release(self):
+        self._finalizer()
+
+class DatasetStore:
+    """
+    Process-wide, reference-counted registry of parsed datasets.
+    Frames are parsed once per fingerprint and shared by every session that
+    holds a handle to them; they are handed out as shallow copy-on-write views,
+    so callers can never modify the shared frame. Datasets no session
+    references are kept in LRU order and evicted beyond `max_idle`.
+    """
+    def __init__(self, max_idle: int = 2):
+        self._frames: 'OrderedDict[str, pd.DataFrame]' = OrderedDict()
+        self._cubes: Dict[str, pd.DataFrame] = {}
+        self._filter_indexes: Dict[str, FilterIndex] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._max_idle = max_idle
+        self._lock = threading.RLock()
+
+    def get(self, fingerprint: str):
+        """Return a read-only view of a cached dataset, or None"""
+        with self._lock:
+            df = self._frames.get(fingerprint)
+            if df is not None:
+                self._frames.move_to_end(fingerprint)
+        return None if df is None else df.copy(deep=False)
+
+    def get_cube(self, fingerprint: str):
+        """Return the metrics cube built for a cached dataset, or None"""
+        with self._lock:
+            return self._cubes.get(fingerprint)
+
+    def get_filter_index(self, fingerprint: str):
+        """Return the filter index over the metrics cube of a cached dataset, or None"""
+        with self._lock:
+            return self._filter_indexes.get(fingerprint)
+
+    def load(self, fingerprint: str, loader: Callable[[], pd.DataFrame],
+             cache_path: str = None, prune_stale: bool = False, keep_recent: int = None) -> pd.DataFrame:
+        """
+        Return the dataset for `fingerprint`. On a miss the columnar sidecar at
+        `cache_path` is tried first; only then is the source read with `loader`,
+        which returns an already prepared dataset (see stream_dataset).
+        """
+        view = self.get(fingerprint)
+        if view is not None:
+            return view
+        df = read_columnar_cache(cache_path) if cache_path else None
+        if df is None:
+            df = loader()
+            if cache_path:
+                write_columnar_cache(df, cache_path, prune_stale=prune_stale, keep_recent=keep_recent)
+        cube = build_metrics_cube(df)
+        filter_index = FilterIndex(cube, FILTER_DIMENSIONS) if cube is not None else None
+        with self._lock:
+            self._frames[fingerprint] = df
+            if cube is not None:
+                self._cubes[fingerprint] = cube
+                self._filter_indexes[fingerprint] = filter_index
+            self._evict_idle()
+        return df.copy(deep=False)
+
+    def acquire(self, fingerprint: str) -> DatasetHandle:
+        """Register a session reference to `fingerprint`"""
+        with self._lock:
+            self._refcounts[fingerprint] = self._refcounts.get(fingerprint, 0) + 1
+        return DatasetHandle(self, fingerprint)
+
+    def release(self, fingerprint: str):
+        """Drop a session reference; unreferenced datasets become evictable"""
+        with self._lock:
+            count = self._refcounts.get(fingerprint, 0) - 1
+            if count > 0:
+                self._refcounts[fingerprint] = count
+            else:
+                self._refcounts.pop(fingerprint, None)
+            self._evict_idle()
+
+    def _evict_idle(self):
+        idle = [fingerprint for fingerprint in self._frames if fingerprint not in self._refcounts]
+        for fingerprint in idle[:max(0, len(idle) - self._max_idle)]:
+            del self._frames[fingerprint]
+            self._cubes.pop(fingerprint, None)
+            self._filter_indexes.pop(fingerprint, None)
+
+@st.cache_resource
+def get_dataset_store() -> DatasetStore:
+    """Process-wide dataset store shared by all sessions"""
+    return DatasetStore()
+
+def attach_dataset(fingerprint: str):
+    """Point this session's handle at `fingerprint`, releasing its previous dataset"""
+    handle = st.session_state.get('dataset_handle')
+    if handle is not None and handle.fingerprint == fingerprint:
+        return
+    st.session_state['dataset_handle'] = get_dataset_store().acquire(fingerprint)
+    if handle is not None:
+        handle.release()
+
 def load_data():
-    """Load data from session state or file paths"""
+    """Load data from the shared store (uploaded dataset first, then file paths)"""
     try:
-        # First priority: Check if dataset is uploaded in session state
-        if 'uploaded_dataframe' in st.session_state:
-            return st.session_state['uploaded_dataframe'].copy()
+        store = get_dataset_store()
         
-        # Try multiple possible paths for default file
-        paths = [
-            'Few_Data_set.xlsx',
-            '/mnt/user-data/uploads/Few_Data_set.xlsx',
-            './Few_Data_set.xlsx'
-        ]
+        # First priority: the dataset uploaded in this session
+        fingerprint = st.session_state.get('uploaded_dataset_fingerprint')
+        if fingerprint is not None:
+            df = store.get(fingerprint)
+            if df is not None:
+                return df
         
-        for path in paths:
+        # Try multiple possible paths for default file
+        for path in DEFAULT_DATASET_PATHS:
             try:
-                df = pd.read_excel(path)
-                df['query_date'] = pd.to_datetime(df['query_date'])
-                return df
+                if not os.path.isfile(path):
+                    continue
+                fingerprint = file_fingerprint(path)
+                attach_dataset(fingerprint)
+                return store.load(
+                    fingerprint,
+                    lambda: stream_dataset(path, path),
+                    cache_path=sidecar_cache_path(path, fingerprint),
+                    prune_stale=True
+                )
             except Exception:
                 continue
         
@@ -135,60 +650,1174 @@ def load_data():
     except Exception as e:
         return pd.DataFrame()
 
+def load_cube():
+    """Metrics cube of the dataset this session currently has loaded"""
+    handle = st.session_state.get('dataset_handle')
+    if handle is None:
+        return None
+    return get_dataset_store().get_cube(handle.fingerprint)
+
+def load_filter_index():
+    """Filter index over the metrics cube of this session's dataset"""
+    handle = st.session_state.get('dataset_handle')
+    if handle is None:
+        return None
+    return get_dataset_store().get_filter_index(handle.fingerprint)
+
+def ingest_uploaded_dataset(uploaded_file) -> pd.DataFrame:
+    """
+    Parse an uploaded dataset once per content hash.
+    The upload widget returns the same file on every rerun, so the hash is
+    remembered per upload id; while it matches, the shared store answers
+    without parsing. Identical uploads from different sessions share one frame.
+    """
+    hashes = st.session_state.setdefault('upload_hashes', {})
+    file_id = getattr(uploaded_file, 'file_id', uploaded_file.name)
+    fingerprint = hashes.get(file_id)
+    if fingerprint is None:
+        fingerprint = bytes_fingerprint(uploaded_file.getvalue())
+        hashes.clear()
+        hashes[file_id] = fingerprint
+    
+    # Take the reference before loading so the new frame can't be evicted
+    attach_dataset(fingerprint)
+    df = get_dataset_store().load(
+        fingerprint,
+        lambda: stream_dataset(uploaded_file, uploaded_file.name, st.sidebar),
+        cache_path=sidecar_cache_path(None, fingerprint),
+        keep_recent=MAX_UPLOAD_CACHES
+    )
+    st.session_state['uploaded_dataset_fingerprint'] = fingerprint
+    return df
+
+# FAQ retrieval: BM25 over an inverted index of the knowledge base FAQs
+TOKEN_PATTERN = re.compile(r'[\w\u0900-\u097F]+')
+STOPWORDS = frozenset("""
+a an and are as at be but by can could do does for from had has have how i if in is it its
+me my of on or our please so tell that the their them there this to was we what when where
+which who why will with would you your hi hello hey
+""".split())
+
+def normalize_token(token: str) -> str:
+    """Light plural folding so 'laptops' matches 'laptop'"""
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, plural-folded word tokens (Latin and Devanagari) without stopwords"""
+    return [normalize_token(token) for token in TOKEN_PATTERN.findall(str(text).lower()) if token not in STOPWORDS]
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Edit distance between a and b counting adjacent transpositions as one
+    edit; gives up early and returns limit + 1 once it must exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class TermCorrector:
+    """
+    Typo-tolerant lookup of words in a vocabulary through a character-trigram
+    index. Terms are indexed per (trigram, length); a misspelt word only
+    gathers terms of nearby length sharing enough of its trigrams, keeps the
+    `max_candidates` best overlaps and verifies those with a bounded edit
+    distance. Lookups never scan the vocabulary.
+    """
+    def __init__(self, terms=(), min_length: int = 4, max_candidates: int = 30, cache_size: int = 4096):
+        self.min_length = min_length
+        self.max_candidates = max_candidates
+        self.cache_size = cache_size
+        self._grams: Dict[tuple, List[str]] = {}
+        self._terms = set()
+        self._cache: Dict[str, tuple] = {}
+        # Shared by all sessions; lookups also update the cache
+        self._lock = threading.RLock()
+        self.add(terms)
+
+    def __contains__(self, term):
+        return term in self._terms
+
+    @staticmethod
+    def max_distance(word: str) -> int:
+        """Edits tolerated for a word: one up to 7 characters, two beyond"""
+        return 1 if len(word) <= 7 else 2
+
+    @staticmethod
+    def trigrams(word: str) -> set:
+        padded = f"${word}$"
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, terms):
+        """Index new vocabulary terms (known and too-short terms are skipped)"""
+        with self._lock:
+            added = False
+            for term in terms:
+                if term in self._terms or len(term) < self.min_length:
+                    continue
+                self._terms.add(term)
+                for gram in self.trigrams(term):
+                    self._grams.setdefault((gram, len(term)), []).append(term)
+                added = True
+            if added:
+                self._cache = {}
+
+    def candidates(self, word: str) -> List[tuple]:
+        """Vocabulary terms within the word's edit budget, as (distance, term), closest first"""
+        with self._lock:
+            cached = self._cache.get(word)
+            if cached is not None:
+                return list(cached)
+            limit = self.max_distance(word)
+            grams = self.trigrams(word)
+            # An insertion, deletion or substitution destroys at most three
+            # trigrams, an adjacent transposition (one edit here) four
+            required = max(1, len(grams) - 4 * limit)
+            shared: Dict[str, int] = {}
+            for length in range(len(word) - limit, len(word) + limit + 1):
+                for gram in grams:
+                    for term in self._grams.get((gram, length), ()):
+                        shared[term] = shared.get(term, 0) + 1
+            pool = sorted((term for term, count in shared.items() if count >= required), key=shared.get, reverse=True)
+            matches = []
+            for term in pool[:self.max_candidates]:
+                distance = bounded_edit_distance(word, term, limit)
+                if distance <= limit:
+                    matches.append((distance, term))
+            matches.sort()
+            if len(self._cache) >= self.cache_size:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[word] = tuple(matches)
+            return matches
+
+    def correct(self, word: str, weight: Callable[[str], float] = None) -> str:
+        """
+        Closest vocabulary term for a misspelt word (ties go to the higher
+        `weight`, e.g. document frequency; terms weighing 0 are skipped),
+        or None when nothing is close enough.
+        """
+        if len(word) < self.min_length or word in self._terms:
+            return None
+        best = None
+        for distance, term in self.candidates(word):
+            term_weight = weight(term) if weight else 1
+            if term_weight <= 0:
+                continue
+            if best is None or (distance, -term_weight) < best[0]:
+                best = ((distance, -term_weight), term)
+        return best[1] if best else None
+
+class FAQIndex:
+    """
+    Inverted index over FAQ question/answer text with BM25 scoring.
+    Postings are kept per term as parallel (slot, term frequency) lists and
+    scored with numpy, so a query only touches the postings of its own terms.
+    The index is maintained incrementally: batches append postings, deletes
+    tombstone their slot, and dead postings are compacted away once they make
+    up `compact_ratio` of the index. Documents are never re-tokenized.
+    Query terms missing from the index are matched to their closest indexed
+    term through a TermCorrector over the vocabulary.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75, compact_ratio: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+        self._keys: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._alive: List[bool] = []
+        self._lengths: List[int] = []
+        self._doc_terms: List[tuple] = []
+        self._doc_freq: Dict[str, int] = {}
+        self._total_length = 0
+        self._postings: Dict[str, tuple] = {}
+        self._arrays: Dict[str, tuple] = {}
+        self._norms = np.zeros(0)
+        self._alive_mask = np.zeros(0, dtype=bool)
+        # Sorted terms for prefix lookups, rebuilt after new terms appear
+        self._vocabulary: List[str] = None
+        # Trigram index over the vocabulary for typo-tolerant lookups
+        self._corrector = TermCorrector()
+        # Shared by all sessions: writes and searches are serialized
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def add(self, entries: Dict[str, Dict]):
+        """Index FAQ entries ({faq_id: entry}) in one batch; existing ids are replaced"""
+        # Tokenize and count outside the lock: searches only wait for the
+        # batch's postings ({term: (batch offsets, term frequencies)}) to be spliced in
+        keys, lengths, doc_terms = [], [], []
+        batch_postings: Dict[str, tuple] = {}
+        for offset, (key, entry) in enumerate(entries.items()):
+            tokens = tokenize(f"{entry.get('question', '')} {entry.get('answer', '')}")
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            keys.append(key)
+            lengths.append(len(tokens))
+            doc_terms.append(tuple(counts))
+            for token, tf in counts.items():
+                offsets, tfs = batch_postings.setdefault(token, ([], []))
+                offsets.append(offset)
+                tfs.append(tf)
+        # Terms known to the corrector but not (yet) indexed weigh 0 and are skipped
+        self._corrector.add(batch_postings)
+        with self._lock:
+            self.remove([key for key in keys if key in self._slots], compact=False)
+            base = len(self._keys)
+            self._keys.extend(keys)
+            self._slots.update((key, base + offset) for offset, key in enumerate(keys))
+            self._alive.extend([True] * len(keys))
+            self._lengths.extend(lengths)
+            self._doc_terms.extend(doc_terms)
+            self._total_length += sum(lengths)
+            for token, (offsets, tfs) in batch_postings.items():
+                if token not in self._postings:
+                    self._vocabulary = None
+                slots, term_tfs = self._postings.setdefault(token, ([], []))
+                slots.extend(base + offset for offset in offsets)
+                term_tfs.extend(tfs)
+                self._doc_freq[token] = self._doc_freq.get(token, 0) + len(offsets)
+                self._arrays.pop(token, None)
+            self._update_norms()
+
+    def remove(self, keys, compact: bool = True):
+        """Tombstone FAQs by id; postings are dropped at the next compaction"""
+        with self._lock:
+            removed = False
+            for key in keys:
+                slot = self._slots.pop(key, None)
+                if slot is None:
+                    continue
+                self._alive[slot] = False
+                self._total_length -= self._lengths[slot]
+                for token in self._doc_terms[slot]:
+                    self._doc_freq[token] -= 1
+                removed = True
+            if not removed:
+                return
+            if compact and len(self._keys) - len(self._slots) > self.compact_ratio * len(self._keys):
+                self.compact()
+            else:
+                self._update_norms()
+
+    def compact(self):
+        """Drop tombstoned documents and renumber slots (postings are filtered, not rebuilt)"""
+        with self._lock:
+            alive = np.asarray(self._alive, dtype=bool)
+            remap = np.cumsum(alive) - 1
+            postings = {}
+            for token, (slots, tfs) in self._postings.items():
+                slot_array = np.asarray(slots, dtype=np.int64)
+                keep = alive[slot_array]
+                if keep.any():
+                    postings[token] = (remap[slot_array[keep]].tolist(), np.asarray(tfs)[keep].tolist())
+            self._postings = postings
+            self._doc_freq = {token: count for token, count in self._doc_freq.items() if count > 0}
+            self._arrays = {}
+            self._vocabulary = None
+        
+            live = np.flatnonzero(alive).tolist()
+            self._keys = [self._keys[slot] for slot in live]
+            self._lengths = [self._lengths[slot] for slot in live]
+            self._doc_terms = [self._doc_terms[slot] for slot in live]
+            self._alive = [True] * len(live)
+            self._slots = {key: slot for slot, key in enumerate(self._keys)}
+            self._update_norms()
+
+    def _update_norms(self):
+        # Per-document BM25 length normalization, recomputed only when documents change
+        lengths = np.asarray(self._lengths, dtype=float)
+        avg_length = (self._total_length / len(self._slots)) if self._slots else 1.0
+        self._norms = self.k1 * (1 - self.b + self.b * lengths / (avg_length or 1.0))
+        self._alive_mask = np.asarray(self._alive, dtype=bool)
+
+    def _posting_arrays(self, token: str):
+        arrays = self._arrays.get(token)
+        if arrays is None:
+            slots, tfs = self._postings[token]
+            arrays = (np.asarray(slots, dtype=np.int64), np.asarray(tfs, dtype=float))
+            self._arrays[token] = arrays
+        return arrays
+
+    def _idf(self, doc_freq: int) -> float:
+        return float(np.log(1 + (len(self._slots) - doc_freq + 0.5) / (doc_freq + 0.5)))
+
+    def _term_scores(self, term: str):
+        """(live slots, BM25 contributions) of one indexed term"""
+        slots, tfs = self._posting_arrays(term)
+        live = self._alive_mask[slots]
+        slots, tfs = slots[live], tfs[live]
+        return slots, self._idf(self._doc_freq[term]) * tfs * (self.k1 + 1) / (tfs + self._norms[slots])
+
+    def _terms_scores(self, terms: List[str]):
+        """(live slots, BM25 contributions) of several indexed terms, concatenated"""
+        if len(terms) == 1:
+            return self._term_scores(terms[0])
+        arrays = [self._posting_arrays(term) for term in terms]
+        slots = np.concatenate([term_slots for term_slots, _ in arrays])
+        tfs = np.concatenate([term_tfs for _, term_tfs in arrays])
+        idfs = np.repeat([self._idf(self._doc_freq[term]) for term in terms], [len(term_slots) for term_slots, _ in arrays])
+        live = self._alive_mask[slots]
+        slots, tfs, idfs = slots[live], tfs[live], idfs[live]
+        return slots, idfs * tfs * (self.k1 + 1) / (tfs + self._norms[slots])
+
+    def correct(self, term: str) -> str:
+        """Closest indexed term to a misspelt query term (preferring common terms), or None"""
+        with self._lock:
+            return self._corrector.correct(term, weight=lambda candidate: self._doc_freq.get(candidate, 0))
+
+    def knows(self, term: str) -> bool:
+        """Whether any live document contains `term`"""
+        return self._doc_freq.get(term, 0) > 0
+
+    def expand_prefix(self, prefix: str) -> List[str]:
+        """Indexed terms starting with `prefix` (binary search over the sorted vocabulary)"""
+        with self._lock:
+            if self._vocabulary is None:
+                self._vocabulary = sorted(self._postings)
+            lo = bisect_left(self._vocabulary, prefix)
+            hi = bisect_left(self._vocabulary, prefix + '\U0010ffff')
+            return [term for term in self._vocabulary[lo:hi] if self._doc_freq.get(term, 0) > 0]
+
+    def find(self, clauses: List[List[str]], offset: int = 0, limit: int = 20, within=None) -> tuple:
+        """
+        Ranked page of the documents matching every clause, as
+        ([(faq_id, score)], total). A clause lists alternative terms; a term
+        ending in '*' stands for every indexed term with that prefix. Scores
+        are BM25 summed over the matched terms. `within` optionally restricts
+        the match to a set of ids (e.g. the result of a phrase query).
+        """
+        with self._lock:
+            if not clauses or not self._slots:
+                return [], 0
+            # Dense per-slot accumulators: each clause costs O(postings + slots)
+            size = len(self._keys)
+            matched = self._alive_mask.copy()
+            if within is not None:
+                allowed = np.zeros(size, dtype=bool)
+                allowed[[self._slots[key] for key in within if key in self._slots]] = True
+                matched &= allowed
+            scores = np.zeros(size)
+            for clause in clauses:
+                terms = set()
+                for term in clause:
+                    terms.update(self.expand_prefix(term[:-1]) if term.endswith('*') else [term])
+                terms = [term for term in terms if self._doc_freq.get(term, 0) > 0]
+                if not terms:
+                    # Nothing indexed matches: try typo corrections of the exact terms
+                    terms = list({self.correct(term) for term in clause if not term.endswith('*')} - {None})
+                if not terms:
+                    return [], 0
+                slots, contributions = self._terms_scores(terms)
+                matched &= np.bincount(slots, minlength=size).astype(bool)
+                scores += np.bincount(slots, weights=contributions, minlength=size)
+            matched_slots = np.flatnonzero(matched)
+            matched_scores = scores[matched_slots]
+            
+            # Only the documents up to the end of the page are sorted
+            total = len(matched_slots)
+            end = min(offset + limit, total)
+            if end <= offset:
+                return [], total
+            best = np.argpartition(-matched_scores, end - 1)[:end]
+            best = best[np.argsort(-matched_scores[best], kind='stable')][offset:end]
+            return [(self._keys[matched_slots[i]], float(matched_scores[i])) for i in best.tolist()], total
+
+    def search(self, query: str, top_k: int = 5) -> List[tuple]:
+        """
+        Best matching FAQs as (faq_id, score, confidence), best first.
+        Confidence is the BM25 score relative to a document that contains
+        every query term once at average length (capped at 1.0), so it is
+        comparable across queries of different lengths.
+        """
+        with self._lock:
+            tokens = set(tokenize(query))
+            if not tokens or not self._slots:
+                return []
+            # Misspelt terms are replaced by their closest indexed term
+            tokens = {
+                token if self._doc_freq.get(token, 0) else (self.correct(token) or token)
+                for token in tokens
+            }
+        
+            # Score only the live documents in the postings of the query terms
+            candidate_slots = []
+            contributions = []
+            ideal = 0.0
+            for token in tokens:
+                doc_freq = self._doc_freq.get(token, 0)
+                ideal += self._idf(doc_freq)
+                if doc_freq == 0:
+                    # Unknown terms lower confidence as much as the rarest known term
+                    continue
+                slots, scores = self._term_scores(token)
+                candidate_slots.append(slots)
+                contributions.append(scores)
+            if not candidate_slots:
+                return []
+        
+            slots, inverse = np.unique(np.concatenate(candidate_slots), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(contributions))
+            top_k = min(top_k, len(scores))
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            best = best[np.argsort(-scores[best])]
+            return [
+                (self._keys[slots[i]], float(scores[i]), min(1.0, float(scores[i]) / ideal))
+                for i in best
+            ]
+
+def faq_text(entry: Dict) -> str:
+    """Text of an FAQ entry as embedded by SemanticIndex (question and answer)"""
+    return f"{entry.get('question', '')} {entry.get('answer', '')}"
+
+class SemanticIndex:
+    """
+    Dense FAQ embeddings for matching by meaning rather than shared words,
+    computed locally: FAQ text becomes hashed TF-IDF word features projected
+    onto the top singular vectors of the FAQ corpus (latent semantic
+    analysis, fitted with a randomized SVD), so words that occur in the same
+    FAQs end up close together. Rows are L2-normalized, so one matrix-vector
+    product scores a query against every FAQ by cosine similarity.
+    Embeddings are computed in batches as FAQs are added and persisted to
+    `path` (.npz), so a restart only embeds the FAQs changed since the last
+    save. The projection is refitted, and every FAQ re-embedded, whenever the
+    corpus has doubled since the last fit.
+    A query only matches when at least `min_coverage` of its TF-IDF vector
+    lies in the fitted space, so queries about unrelated topics (mostly
+    words the FAQs never use) find nothing instead of a spurious nearest FAQ.
+    """
+    def __init__(self, path: str = None, n_features: int = 2 ** 16, dimensions: int = 64,
+                 min_documents: int = 10, fit_sample: int = 10_000, batch_size: int = 4096,
+                 save_every: int = 100, min_coverage: float = 0.1):
+        self.path = path
+        self.n_features = n_features
+        self.dimensions = dimensions
+        self.min_documents = min_documents
+        self.fit_sample = fit_sample
+        self.batch_size = batch_size
+        self.save_every = save_every
+        self.min_coverage = min_coverage
+        self._keys: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._fingerprints: List[int] = []
+        # Rows [0, len(self._keys)) are live; capacity grows geometrically
+        self._matrix = np.zeros((0, dimensions), dtype=np.float32)
+        # Entries by id, kept to re-embed everything after a refit
+        self._entries: Dict[str, Dict] = {}
+        self._basis = None
+        self._idf = None
+        self._fitted_on = 0
+        self._unsaved = 0
+        self._feature_ids: Dict[str, int] = {}
+        # Shared by all sessions: writes and searches are serialized
+        self._lock = threading.RLock()
+        # Saves run one at a time, periodic ones on a background thread
+        self._save_lock = threading.Lock()
+        self._saver = None
+        self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def ready(self) -> bool:
+        """Whether the projection is fitted (needs `min_documents` FAQs)"""
+        return self._basis is not None
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as saved:
+                basis = saved['basis']
+                if basis.shape[0] != self.n_features or basis.shape[1] > self.dimensions:
+                    return
+                self._keys = saved['keys'].tolist()
+                self._fingerprints = saved['fingerprints'].tolist()
+                self._matrix = saved['matrix'].astype(np.float32)
+                self._basis = basis
+                self._idf = saved['idf']
+                self._fitted_on = int(saved['fitted_on'])
+        except (OSError, ValueError, KeyError):
+            # Unreadable or outdated file: start over, FAQs are re-embedded
+            self._keys, self._fingerprints, self._basis, self._idf = [], [], None, None
+            return
+        self._slots = {key: slot for slot, key in enumerate(self._keys)}
+
+    def save(self):
+        """Write the embeddings to `path` (atomically, via a temporary file; not while holding the index lock)"""
+        with self._save_lock:
+            # Snapshot under the lock; searches don't wait for the file write
+            with self._lock:
+                if not self.path or self._basis is None:
+                    return
+                arrays = dict(
+                    keys=np.asarray(self._keys, dtype=str),
+                    fingerprints=np.asarray(self._fingerprints, dtype=np.int64),
+                    matrix=self._matrix[:len(self._keys)].copy(),
+                    basis=self._basis,
+                    idf=self._idf,
+                    fitted_on=self._fitted_on
+                )
+                self._unsaved = 0
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.path)
+
+    def _save_later(self):
+        """Save on a background thread, off the caller's request path"""
+        if self._saver is None or not self._saver.is_alive():
+            self._saver = threading.Thread(target=self.save, name='semantic-index-save', daemon=True)
+            self._saver.start()
+
+    def _features(self, texts: List[str]) -> tuple:
+        """Sparse (row, feature, count) triplets of a batch of texts, sorted by row"""
+        # Stable hashes (crc32, not hash()) so saved embeddings stay valid across restarts
+        feature_ids = self._feature_ids
+        if len(feature_ids) > 500_000:
+            feature_ids.clear()
+        features = []
+        lengths = []
+        for text in texts:
+            start = len(features)
+            # Same terms as tokenize(), cached per raw word (stopwords map to -1)
+            for word in TOKEN_PATTERN.findall(str(text).lower()):
+                feature = feature_ids.get(word)
+                if feature is None:
+                    feature = -1 if word in STOPWORDS else zlib.crc32(normalize_token(word).encode()) % self.n_features
+                    feature_ids[word] = feature
+                if feature >= 0:
+                    features.append(feature)
+            lengths.append(len(features) - start)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        pairs, counts = np.unique(rows * self.n_features + np.asarray(features, dtype=np.int64), return_counts=True)
+        return pairs // self.n_features, pairs % self.n_features, counts.astype(float)
+
+    def _weights(self, rows: np.ndarray, features: np.ndarray, counts: np.ndarray, n_rows: int) -> np.ndarray:
+        """Sublinear TF-IDF weights of the triplets, L2-normalized per row"""
+        weights = (1 + np.log(counts)) * self._idf[features]
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=n_rows))
+        return weights / np.maximum(norms[rows], 1e-12)
+
+    @staticmethod
+    def _sparse_dot(rows, columns, weights, dense: np.ndarray, n_rows: int) -> np.ndarray:
+        """
+        Sparse matrix given as (row, column, weight) triplets sorted by row,
+        times a dense matrix. Rows of `dense` are gathered and summed per row
+        with reduceat, a bounded number of triplets at a time.
+        """
+        result = np.zeros((n_rows, dense.shape[1]), dtype=dense.dtype)
+        step = max(1, 2 ** 22 // dense.shape[1])
+        for start in range(0, len(rows), step):
+            chunk_rows = rows[start:start + step]
+            products = dense[columns[start:start + step]] * weights[start:start + step, None].astype(dense.dtype)
+            chunk_unique, starts = np.unique(chunk_rows, return_index=True)
+            # A row split across chunks is summed from both sides
+            result[chunk_unique] += np.add.reduceat(products, starts)
+        return result
+
+    def _fit(self, texts: List[str]):
+        """Fit IDF weights and the SVD projection on (a sample of) the corpus"""
+        rng = np.random.default_rng(0)
+        if len(texts) > self.fit_sample:
+            texts = [texts[i] for i in rng.choice(len(texts), self.fit_sample, replace=False)]
+        rows, features, counts = self._features(texts)
+        n_docs = len(texts)
+        doc_freq = np.bincount(features, minlength=self.n_features)
+        self._idf = np.log((1 + n_docs) / (1 + doc_freq)) + 1
+        weights = self._weights(rows, features, counts, n_docs)
+        # Factorize over the features the sample uses only; the transposed
+        # (feature x document) triplets are sorted by feature
+        used, columns = np.unique(features, return_inverse=True)
+        order = np.argsort(columns, kind='stable')
+        transposed = (columns[order], rows[order], weights[order])
+
+        # Randomized SVD with two power iterations (Halko et al.)
+        rank = min(self.dimensions, n_docs, len(used))
+        sketch = rng.standard_normal((len(used), min(rank + 10, n_docs, len(used)))).astype(np.float32)
+        q, _ = np.linalg.qr(self._sparse_dot(rows, columns, weights, sketch, n_docs))
+        for _ in range(2):
+            q, _ = np.linalg.qr(self._sparse_dot(*transposed, q, len(used)))
+            q, _ = np.linalg.qr(self._sparse_dot(rows, columns, weights, q, n_docs))
+        projected = self._sparse_dot(*transposed, q, len(used)).T
+        _, _, vt = np.linalg.svd(projected, full_matrices=False)
+        self._basis = np.zeros((self.n_features, rank), dtype=np.float32)
+        self._basis[used] = vt[:rank].T
+        self._fitted_on = len(self._entries)
+
+    def _project(self, texts: List[str]) -> np.ndarray:
+        """Unit TF-IDF vectors of texts projected onto the fitted space (norm = coverage)"""
+        rows, features, counts = self._features(texts)
+        weights = self._weights(rows, features, counts, len(texts))
+        return self._sparse_dot(rows, features, weights, self._basis, len(texts))
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """L2-normalized embeddings of texts, computed `batch_size` texts at a time"""
+        embeddings = np.zeros((len(texts), self._basis.shape[1]), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            vectors = self._project(texts[start:start + self.batch_size])
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            embeddings[start:start + len(vectors)] = vectors / np.maximum(norms, 1e-12)
+        return embeddings
+
+    def _refit(self):
+        keys = list(self._entries)
+        texts = [faq_text(self._entries[key]) for key in keys]
+        self._fit(texts)
+        self._keys = keys
+        self._slots = {key: slot for slot, key in enumerate(keys)}
+        self._fingerprints = [zlib.crc32(text.encode()) for text in texts]
+        self._matrix = self._embed(texts)
+        self._unsaved += len(keys)
+
+    def add(self, entries: Dict[str, Dict]):
+        """Embed FAQ entries ({faq_id: entry}) in batches; unchanged FAQs are skipped"""
+        with self._lock:
+            self._entries.update(entries)
+            if len(self._entries) < self.min_documents:
+                return
+            if self._basis is None or len(self._entries) >= 2 * self._fitted_on:
+                self._refit()
+            else:
+                changed = []
+                for key, entry in entries.items():
+                    fingerprint = zlib.crc32(faq_text(entry).encode())
+                    slot = self._slots.get(key)
+                    if slot is None or self._fingerprints[slot] != fingerprint:
+                        changed.append((key, fingerprint))
+                if not changed:
+                    return
+                vectors = self._embed([faq_text(entries[key]) for key, _ in changed])
+                needed = len(self._keys) + len(changed)
+                if needed > len(self._matrix):
+                    grown = np.zeros((max(needed, 2 * len(self._matrix)), self._matrix.shape[1]), dtype=np.float32)
+                    grown[:len(self._keys)] = self._matrix[:len(self._keys)]
+                    self._matrix = grown
+                for (key, fingerprint), vector in zip(changed, vectors):
+                    slot = self._slots.get(key)
+                    if slot is None:
+                        slot = self._slots[key] = len(self._keys)
+                        self._keys.append(key)
+                        self._fingerprints.append(fingerprint)
+                    self._fingerprints[slot] = fingerprint
+                    self._matrix[slot] = vector
+                self._unsaved += len(changed)
+            if self._unsaved >= self.save_every:
+                self._save_later()
+
+    def remove(self, keys):
+        """Drop FAQs by id (the last row moves into each freed slot)"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                slot = self._slots.pop(key, None)
+                if slot is None:
+                    continue
+                last = len(self._keys) - 1
+                if slot != last:
+                    moved = self._keys[last]
+                    self._keys[slot] = moved
+                    self._slots[moved] = slot
+                    self._fingerprints[slot] = self._fingerprints[last]
+                    self._matrix[slot] = self._matrix[last]
+                self._keys.pop()
+                self._fingerprints.pop()
+                self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self._save_later()
+
+    def sync(self, entries: Dict[str, Dict]):
+        """Reconcile saved embeddings with the current FAQs (on startup), then save"""
+        with self._lock:
+            self.remove([key for key in self._slots if key not in entries])
+            self.add(entries)
+        # Outside the lock: save() takes it after the save lock
+        if self._unsaved:
+            self.save()
+
+    def search(self, query: str, top_k: int = 5) -> List[tuple]:
+        """Most similar FAQs as (faq_id, cosine similarity), best first"""
+        with self._lock:
+            if self._basis is None or not self._keys:
+                return []
+            query_vector = self._project([query])[0]
+            coverage = np.linalg.norm(query_vector)
+            if coverage < self.min_coverage:
+                return []
+            # One matrix-vector product scores every FAQ
+            scores = self._matrix[:len(self._keys)] @ (query_vector / coverage).astype(np.float32)
+            top_k = min(top_k, len(scores))
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            best = best[np.argsort(-scores[best])]
+            return [(self._keys[i], float(scores[i])) for i in best]
+
+# Persistent knowledge base, shared by all sessions (see KnowledgeBaseStore)
+KB_DB_PATH = os.environ.get('KB_DB_PATH', 'knowledge_base.db')
+# FAQ embeddings of the semantic index, saved next to the database
+SEMANTIC_INDEX_PATH = os.environ.get('SEMANTIC_INDEX_PATH', os.path.splitext(KB_DB_PATH)[0] + '.vectors.npz')
+
+@st.cache_resource
+def get_knowledge_base() -> KnowledgeBaseStore:
+    """Process-wide knowledge base; its FAQ indexes are kept in sync on every write"""
+    return KnowledgeBaseStore(KB_DB_PATH, faq_index=FAQIndex())
+
+def get_faq_index() -> FAQIndex:
+    """FAQ index over the shared knowledge base"""
+    return get_knowledge_base().faq_index
+
+class SemanticIndexHandle:
+    """
+    A reference to the shared semantic index (see SharedSemanticIndex.acquire),
+    released explicitly or when its holder is garbage collected.
+    """
+    def __init__(self, shared: 'SharedSemanticIndex', index: SemanticIndex):
+        self.index = index
+        self._shared = shared
+        self._finalizer = weakref.finalize(self, shared.release_soon)
+
+    def release(self):
+        if self._finalizer.detach() is not None:
+            self._shared.release()
+
+class SharedSemanticIndex:
+    """
+    The semantic (embedding) index over the shared knowledge base, kept only
+    while something uses it. The first handle builds it (from the saved
+    embeddings) and attaches it to the knowledge base; releasing the last
+    one (semantic matching turned off, or the session gone) detaches, saves
+    and drops it, so knowledge base writes stop paying for embeddings.
+    """
+    def __init__(self, knowledge_base: KnowledgeBaseStore, path: str):
+        self.knowledge_base = knowledge_base
+        self.path = path
+        self._index = None
+        self._users = 0
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> SemanticIndex:
+        """The index while attached, else None"""
+        return self._index
+
+    def acquire(self) -> SemanticIndexHandle:
+        with self._lock:
+            self._users += 1
+            if self._index is None:
+                index = SemanticIndex(self.path)
+                self.knowledge_base.add_index(index)
+                self._index = index
+            return SemanticIndexHandle(self, self._index)
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users > 0 or self._index is None:
+                return
+            index, self._index = self._index, None
+            self.knowledge_base.remove_index(index)
+        # Kept for a quick rebuild the next time semantic matching is turned on
+        index.save()
+
+    def release_soon(self):
+        """release() for a garbage-collected handle, off the collecting thread (which may hold any lock)"""
+        threading.Thread(target=self.release, daemon=True).start()
+
+@st.cache_resource
+def get_shared_semantic_index() -> SharedSemanticIndex:
+    """Process-wide semantic index holder over the shared knowledge base"""
+    return SharedSemanticIndex(get_knowledge_base(), SEMANTIC_INDEX_PATH)
+
+def use_semantic_index() -> SemanticIndex:
+    """
+    The semantic index while this session has semantic matching on, else
+    None; the session holds a handle to it only meanwhile
+    """
+    handle = st.session_state.get('semantic_index_handle')
+    if st.session_state.semantic_matching:
+        if handle is None:
+            handle = st.session_state['semantic_index_handle'] = get_shared_semantic_index().acquire()
+        return handle.index
+    if handle is not None:
+        del st.session_state['semantic_index_handle']
+        handle.release()
+    return None
+
+st.session_state.knowledge_base = get_knowledge_base()
+
+# Knowledge Base search: "quoted phrases", prefix* words and plain words
+KB_SEARCH_PAGE_SIZE = 20
+SEARCH_PART_PATTERN = re.compile(r'"([^"]*)"?|(\S+)')
+WORD_CHARS = r'\w\u0900-\u097F'
+# A last word shorter than this is not expanded as a prefix while typing
+MIN_TYPED_PREFIX = 3
+
+def parse_search_query(query: str) -> tuple:
+    """
+    Split a Knowledge Base search into FAQIndex.find clauses and phrases
+    (word lists). "quoted text" must appear as written, word* matches any
+    word starting with `word` and every other word must appear. The last
+    word may still be being typed, so it also matches as a prefix.
+    """
+    clauses = []
+    phrases = []
+    parts = SEARCH_PART_PATTERN.findall(query.lower())
+    for position, (phrase, part) in enumerate(parts):
+        if phrase:
+            words = TOKEN_PATTERN.findall(phrase)
+            if words:
+                # Stopwords aren't indexed: a phrase of only stopwords adds no clause
+                # and is matched by the phrase check alone (see search_knowledge_base)
+                clauses.extend([token] for token in tokenize(phrase))
+                phrases.append(words)
+            continue
+        words = TOKEN_PATTERN.findall(part)
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            if last and part.endswith('*'):
+                clauses.append([word + '*'])
+            elif last and position == len(parts) - 1 and len(word) >= MIN_TYPED_PREFIX and word not in STOPWORDS:
+                clauses.append(tokenize(word) + [word + '*'])
+            elif tokenize(word):
+                clauses.append(tokenize(word))
+    return clauses, phrases
+
+def search_knowledge_base(query: str, page: int = 1, page_size: int = KB_SEARCH_PAGE_SIZE) -> tuple:
+    """A ranked page of FAQ matches for a search, as ([(faq_id, score)], total)"""
+    clauses, phrases = parse_search_query(query)
+    kb = st.session_state.knowledge_base
+    index = get_faq_index()
+    within = None
+    if phrases and kb.fts_enabled:
+        # Word positions live in the FTS5 index: one unranked phrase query
+        within = kb.matching_keys(' AND '.join('"' + ' '.join(words) + '"' for words in phrases))
+    elif phrases:
+        # No FTS5: check the phrases against the text of every candidate
+        patterns = [
+            re.compile(f'(?<![{WORD_CHARS}])' + f'[^{WORD_CHARS}]+'.join(map(re.escape, words)) + f'(?![{WORD_CHARS}])', re.IGNORECASE)
+            for words in phrases
+        ]
+        if clauses:
+            candidates = [faq_id for faq_id, _ in index.find(clauses, limit=len(index))[0]]
+        else:
+            # Stopword-only phrases leave no indexed terms to narrow by
+            candidates = [key for key, entry in kb.items() if entry.get('type') == 'faq']
+        within = {
+            faq_id for faq_id in candidates
+            if faq_id in kb and all(pattern.search(f"{kb[faq_id]['question']}\n{kb[faq_id]['answer']}") for pattern in patterns)
+        }
+    if not clauses and within is not None:
+        # Nothing to rank by: the phrase matches in knowledge base order
+        matches = [key for key in kb if key in within]
+        start = (page - 1) * page_size
+        return [(key, 0.0) for key in matches[start:start + page_size]], len(matches)
+    return index.find(clauses, offset=(page - 1) * page_size, limit=page_size, within=within)
+
+# Keyword intent rules answering queries no FAQ matches: intents, keywords,
+# responses, categories and confidences are data, edited in the JSON file
+INTENT_RULES_PATH = os.environ.get(
+    'INTENT_RULES_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intent_rules.json')
+)
+INTENT_RULE_FIELDS = ['intent', 'keywords', 'response', 'category', 'confidence']
+FALLBACK_RULE_FIELDS = ['response', 'category', 'confidence']
+# Served when no version of the rules file has loaded: every query escalates
+DEFAULT_FALLBACK_RULE = {
+    'response': "I understand your query, but I need to connect you with our support team for detailed assistance.",
+    'category': 'Complex Query',
+    'confidence': 0.4
+}
+
+class IntentMatcher:
+    """
+    Keyword intent rules compiled into one regex alternation (longest
+    keywords first), so a message is scanned once for the keywords of every
+    intent. Keywords match anywhere in the lowercased text ('install' also
+    matches 'reinstalling'), phrases across any whitespace; a keyword listed
+    twice belongs to its first intent. Each intent scores the number of
+    distinct keywords found and the best one wins, ties going to the
+    earlier rule.
+    """
+    def __init__(self, intents: List[Dict], fallback: Dict):
+        self.intents = intents
+        self.fallback = fallback
+        self._keyword_intents: Dict[str, int] = {}
+        for position, intent in enumerate(intents):
+            for keyword in intent['keywords']:
+                self._keyword_intents.setdefault(' '.join(keyword.lower().split()), position)
+        keywords = sorted(self._keyword_intents, key=len, reverse=True)
+        self._pattern = re.compile('|'.join(r'\s+'.join(map(re.escape, keyword.split())) for keyword in keywords)) if keywords else None
+        # Misspelt keywords ("warrenty", "refnd") are corrected before matching
+        self.corrector = TermCorrector({word for keyword in keywords for word in keyword.split()}, min_length=5)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'IntentMatcher':
+        """
+        Load rules from JSON: {"intents": [{intent, keywords, response, category, confidence}], "fallback": {...}}.
+        Raises ValueError naming the problem when the file isn't valid JSON or a rule is malformed.
+        """
+        with open(path, encoding='utf-8') as f:
+            try:
+                rules = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path} is not valid JSON ({e})") from e
+        if not isinstance(rules, dict) or not isinstance(rules.get('intents'), list):
+            raise ValueError(f"{path} must hold an object with an \"intents\" list")
+        for position, intent in enumerate(rules['intents']):
+            cls.check_rule(intent, INTENT_RULE_FIELDS, f"Intent rule {position + 1} in {path}")
+        fallback = rules.get('fallback', {})
+        cls.check_rule(fallback, FALLBACK_RULE_FIELDS, f"Fallback rule in {path}")
+        return cls(rules['intents'], fallback)
+
+    @staticmethod
+    def check_rule(rule, fields: List[str], where: str):
+        """Raise ValueError when a rule lacks one of `fields` or holds a value of the wrong type"""
+        if not isinstance(rule, dict):
+            raise ValueError(f"{where} is not an object")
+        missing = [field for field in fields if field not in rule]
+        if missing:
+            raise ValueError(f"{where} lacks {', '.join(missing)}")
+        for field in fields:
+            value = rule[field]
+            if field == 'keywords':
+                # An empty keyword would match every message
+                valid = isinstance(value, list) and all(isinstance(keyword, str) and keyword.strip() for keyword in value)
+            elif field == 'confidence':
+                valid = isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value <= 1
+            else:
+                valid = isinstance(value, str)
+            if not valid:
+                raise ValueError(f"{where} has an invalid {field}: {value!r}")
+
+    def match(self, text: str) -> Dict:
+        """Best intent rule for lowercased text, or the fallback rule when no keyword occurs"""
+        if self._pattern is None:
+            return self.fallback
+        hits: Dict[int, set] = {}
+        for found in self._pattern.finditer(text):
+            keyword = ' '.join(found.group(0).split())
+            hits.setdefault(self._keyword_intents[keyword], set()).add(keyword)
+        if not hits:
+            return self.fallback
+        best = min(hits, key=lambda position: (-len(hits[position]), position))
+        return self.intents[best]
+
+@st.cache_resource
+def load_intent_matcher(path: str, modified: float) -> IntentMatcher:
+    """Compiled intent rules, cached per file version (`modified` is the file's mtime)"""
+    return IntentMatcher.from_file(path)
+
+@st.cache_resource
+def served_intent_rules() -> Dict:
+    """The intent rules last served ({'matcher': IntentMatcher}), kept while the rules file is broken"""
+    return {}
+
+def get_intent_matcher() -> IntentMatcher:
+    """
+    Intent rules from INTENT_RULES_PATH, recompiled when the file changes.
+    A file that doesn't load is reported with st.error, and the last rules
+    that did (or only the built-in fallback rule) are served meanwhile.
+    """
+    served = served_intent_rules()
+    try:
+        matcher = load_intent_matcher(INTENT_RULES_PATH, os.path.getmtime(INTENT_RULES_PATH))
+    except (OSError, ValueError) as e:
+        st.error(f"❌ Could not load intent rules: {e}. Serving the last rules that loaded.")
+        return served.setdefault('matcher', IntentMatcher([], DEFAULT_FALLBACK_RULE))
+    served['matcher'] = matcher
+    return matcher
+
+class ResponseCache:
+    """
+    Bounded LRU cache of agent responses with a time-to-live, shared by all
+    sessions. Every lookup carries a generation (knowledge base version,
+    intent rules); when it differs from the cached one the whole cache is
+    dropped, so answers never outlive the data they came from.
+    """
+    def __init__(self, max_size: int = 1024, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _validate(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key: tuple, generation) -> Dict:
+        """A copy of the cached response for `key`, or None (missing, expired or stale)"""
+        with self._lock:
+            self._validate(generation)
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(cached[1])
+            if cached is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, generation, response: Dict):
+        with self._lock:
+            self._validate(generation)
+            self._entries[key] = (time.monotonic() + self.ttl, dict(response))
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Size and hit/miss/eviction/invalidation counters since startup"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache of chat responses (see ResponseCache)"""
+    return ResponseCache()
+
 # Simple AI Response Generator (Mock)
 class SimpleAIAgent:
-    def __init__(self, knowledge_base: Dict = None):
-        self.knowledge_base = knowledge_base or {}
+    def __init__(self, knowledge_base: Dict = None, faq_index: FAQIndex = None, semantic_index: SemanticIndex = None,
+                 intent_matcher: IntentMatcher = None, response_cache: ResponseCache = None):
+        self.knowledge_base = knowledge_base if knowledge_base is not None else {}
+        # Optional: repeated queries are answered from the cache
+        self.response_cache = response_cache
+        self.faq_index = faq_index
+        self.intent_matcher = intent_matcher if intent_matcher is not None else get_intent_matcher()
+        # Optional semantic mode: FAQs are also matched by embedding similarity
+        self.semantic_index = semantic_index
         self.confidence_threshold = 0.7
+        # FAQ matches below this confidence fall back to the keyword rules; above
+        # it an FAQ still only wins if it clears confidence_threshold or beats the rule
+        self.faq_min_confidence = 0.5
+        # Semantic matches below this cosine similarity are ignored
+        self.semantic_min_similarity = 0.6
         
     def detect_language(self, text: str) -> str:
-        """Detect language (simple heuristic)"""
-        hindi_chars = re.findall(r'[\u0900-\u097F]', text)
-        marathi_chars = re.findall(r'[\u0900-\u097F]', text)
-        
-        if len(hindi_chars) > 0:
-            return "Hindi"
-        elif len(marathi_chars) > 0:
-            return "Marathi"
-        else:
-            return "English"
+        """Detect language: English, Hindi, Marathi or Hinglish (see language_detection)"""
+        return detect_language(text)
+    
+    def correct_typos(self, text: str) -> str:
+        """Replace misspelt rule keywords in lowercased text ("instalation" -> "installation")"""
+        def correct(match):
+            word = match.group(0)
+            # Words the knowledge base uses are not typos
+            if self.faq_index is not None and self.faq_index.knows(normalize_token(word)):
+                return word
+            return self.intent_matcher.corrector.correct(word) or word
+        return TOKEN_PATTERN.sub(correct, text)
+    
+    def _cache_generation(self) -> tuple:
+        """Shared data cached responses depend on; a change drops every cached response"""
+        return (getattr(self.knowledge_base, 'version', None), self.intent_matcher)
     
     def get_response(self, query: str, language: str = "English") -> Dict:
-        """Generate AI response based on query"""
-        query_lower = query.lower()
-        confidence = 0.5
-        response = ""
-        category = "General Inquiry"
-        
-        # Knowledge base lookup (simple keyword matching)
-        if any(word in query_lower for word in ['warranty', 'guarantee']):
-            response = "Our products come with a 1-year warranty for manufacturing defects."
-            confidence = 0.9
-            category = "Product Information"
-        elif any(word in query_lower for word in ['price', 'cost', 'payment']):
-            response = "Please visit our pricing page or contact sales for detailed pricing information."
-            confidence = 0.85
-            category = "Billing"
-        elif any(word in query_lower for word in ['install', 'setup', 'installation']):
-            response = "Installation guide: 1) Download the software 2) Run installer 3) Follow on-screen instructions. Support available 24/7."
-            confidence = 0.88
-            category = "Technical Support"
-        elif any(word in query_lower for word in ['refund', 'return', 'cancel']):
-            response = "Refund requests can be made within 30 days. Please provide your order ID."
-            confidence = 0.82
-            category = "Billing"
-        elif any(word in query_lower for word in ['location', 'office', 'address']):
-            response = "Our office is located at XYZ Road, Nagpur, Maharashtra, India."
-            confidence = 0.95
-            category = "General Inquiry"
-        elif any(word in query_lower for word in ['contact', 'phone', 'email']):
-            response = "Contact us at support@example.com or call +91-XXXXXXXXXX"
-            confidence = 0.9
-            category = "General Inquiry"
+        """Generate AI response based on query (from the response cache when one is set)"""
+        if self.response_cache is None:
+            return self._generate_response(query, language)
+        # Case and spacing don't change the answer; thresholds are set per session,
+        # so they are part of the key rather than of the shared generation
+        key = (
+            ' '.join(query.lower().split()), language, self.semantic_index is not None,
+            self.confidence_threshold, self.faq_min_confidence, self.semantic_min_similarity
+        )
+        generation = self._cache_generation()
+        result = self.response_cache.get(key, generation)
+        if result is None:
+            result = self._generate_response(query, language)
+            self.response_cache.put(key, generation, result)
+        return result
+    
+    def get_responses(self, queries: Iterable[str], languages: Iterable[str] = None) -> List[Dict]:
+        """
+        Responses for many queries (e.g. a historical query log), in order.
+        Each distinct (query, language) is answered once, which is what makes
+        replaying large logs cheap; the shared response cache is bypassed so
+        a replay never evicts live chat answers. `languages` defaults to English.
+        """
+        queries = list(queries)
+        languages = ["English"] * len(queries) if languages is None else list(languages)
+        answered: Dict[tuple, Dict] = {}
+        results = []
+        for query, language in zip(queries, languages):
+            query = query if isinstance(query, str) else ""
+            key = (' '.join(query.lower().split()), language)
+            result = answered.get(key)
+            if result is None:
+                result = answered[key] = self._generate_response(query, language)
+            results.append(dict(result))
+        return results
+    
+    def _generate_response(self, query: str, language: str) -> Dict:
+        query_lower = self.correct_typos(query.lower())
+        
+        # Knowledge base lookup: best FAQ from the retrieval index
+        faq_match = None
+        if self.faq_index is not None:
+            matches = self.faq_index.search(query, top_k=1)
+            if matches and matches[0][2] >= self.faq_min_confidence and matches[0][0] in self.knowledge_base:
+                faq_match = matches[0]
+        # Semantic mode: FAQs phrased differently from the query, by similarity
+        if faq_match is None and self.semantic_index is not None:
+            matches = self.semantic_index.search(query, top_k=1)
+            if matches and matches[0][1] >= self.semantic_min_similarity and matches[0][0] in self.knowledge_base:
+                faq_match = (matches[0][0], matches[0][1], matches[0][1])
+        
+        # Keyword intent rules, all intents scored in one pass
+        rule = self.intent_matcher.match(query_lower)
+        # A weak FAQ hit must not replace a confident rule (and raise a ticket)
+        if faq_match and (faq_match[2] >= self.confidence_threshold or faq_match[2] > rule['confidence']):
+            faq = self.knowledge_base[faq_match[0]]
+            response = faq['answer']
+            confidence = round(faq_match[2], 2)
+            category = faq.get('category', 'General')
         else:
-            response = "I understand your query, but I need to connect you with our support team for detailed assistance."
-            confidence = 0.4
-            category = "Complex Query"
+            response = rule['response']
+            confidence = rule['confidence']
+            category = rule['category']
         
         # Translate if needed (mock translation)
         if language == "Hindi" and confidence > 0.7:
@@ -204,106 +1833,436 @@ class SimpleAIAgent:
         }
 
 # Initialize AI Agent
-ai_agent = SimpleAIAgent()
+ai_agent = SimpleAIAgent(
+    st.session_state.knowledge_base,
+    faq_index=get_faq_index(),
+    semantic_index=use_semantic_index(),
+    response_cache=get_response_cache()
+)
+ai_agent.confidence_threshold = st.session_state.confidence_threshold
+
+# Columns the What-if replay needs from the query log
+REPLAY_COLUMNS = ['customer_query', 'query_category', 'ticket_created']
 
-def detect_faq_columns(df: pd.DataFrame) -> tuple:
+def replay_query_log(df: pd.DataFrame, agent: SimpleAIAgent) -> Dict:
     """
-    Detect if a DataFrame contains FAQ data
-    Returns: (is_faq: bool, columns: dict)
+    Run every logged customer query through `agent` and compare with what
+    was recorded: predicted vs recorded resolution rate (no ticket), how
+    often the escalation decision and the category agree, and the
+    recorded-by-predicted category and outcome confusion matrices.
     """
-    columns_lower = {col: col.lower().strip() for col in df.columns}
+    start = time.perf_counter()
+    languages = df['language'].astype(str).tolist() if 'language' in df.columns else None
+    results = agent.get_responses(df['customer_query'].tolist(), languages)
+    elapsed = time.perf_counter() - start
     
-    # Possible question column names
-    question_patterns = ['question', 'q', 'query', 'faq', 'questions', 'ask']
-    # Possible answer column names
-    answer_patterns = ['answer', 'a', 'response', 'reply', 'answers', 'solution']
-    # Optional columns
-    category_patterns = ['category', 'type', 'topic', 'group']
-    language_patterns = ['language', 'lang', 'locale']
-    
-    question_col = None
-    answer_col = None
-    category_col = None
-    language_col = None
+    predicted_category = pd.Series([result['category'] for result in results], index=df.index, name='Predicted')
+    escalated = np.fromiter((result['needs_escalation'] for result in results), dtype=bool, count=len(results))
+    recorded_ticket = df['ticket_created'].to_numpy(dtype=bool)
+    recorded_category = df['query_category'].astype(str).rename('Recorded')
+    outcomes = ['Auto-resolved', 'Ticket']
+    return {
+        'queries': len(df),
+        'elapsed': elapsed,
+        'threshold': agent.confidence_threshold,
+        'semantic': agent.semantic_index is not None,
+        'predicted_resolution': float(1 - escalated.mean()) if len(df) else 0.0,
+        'recorded_resolution': float(1 - recorded_ticket.mean()) if len(df) else 0.0,
+        'outcome_agreement': float((escalated == recorded_ticket).mean()) if len(df) else 0.0,
+        'category_agreement': float((predicted_category == recorded_category).mean()) if len(df) else 0.0,
+        'category_confusion': pd.crosstab(recorded_category, predicted_category),
+        'outcome_confusion': pd.crosstab(
+            pd.Series(np.where(recorded_ticket, 'Ticket', 'Auto-resolved'), name='Recorded'),
+            pd.Series(np.where(escalated, 'Ticket', 'Auto-resolved'), name='Predicted')
+        ).reindex(index=outcomes, columns=outcomes, fill_value=0)
+    }
+
+def allocate_faq_ids(count: int, existing=None) -> List[str]:
+    """Allocate `count` new FAQ ids in one batch (unique within the batch and `existing`, the knowledge base by default)"""
+    if existing is None:
+        existing = st.session_state.knowledge_base
+    rng = np.random.default_rng()
+    ids = []
+    taken = set()
+    while len(ids) < count:
+        candidates = np.char.mod('FAQ-%08x', rng.integers(0, 2 ** 32, size=count - len(ids), dtype=np.uint64))
+        for faq_id in candidates.tolist():
+            if faq_id not in taken and faq_id not in existing:
+                taken.add(faq_id)
+                ids.append(faq_id)
+    return ids
+
+def build_faq_entries(df: pd.DataFrame, columns: dict, source_file: str, sheet_name: str,
+                      existing=None) -> Dict[str, Dict]:
+    """
+    Turn FAQ rows into knowledge base entries ({faq_id: entry}) without storing them.
+    Cleaning is done with column operations, so large sheets don't pay
+    per-row Python costs. Doesn't touch session state when `existing` is given.
+    """
+    faqs = pd.DataFrame({
+        'question': df[columns['question']],
+        'answer': df[columns['answer']]
+    })
     
-    # Find question column
-    for col, col_lower in columns_lower.items():
-        if any(pattern in col_lower for pattern in question_patterns):
-            question_col = col
-            break
+    # Optional fields: a default category, and languages detected from the
+    # question where the sheet has none
+    if columns.get('category') and columns['category'] in df.columns:
+        faqs['category'] = df[columns['category']].fillna('General')
+    else:
+        faqs['category'] = 'General'
+    if columns.get('language') and columns['language'] in df.columns:
+        faqs['language'] = df[columns['language']]
+    else:
+        faqs['language'] = None
     
-    # Find answer column
-    for col, col_lower in columns_lower.items():
-        if any(pattern in col_lower for pattern in answer_patterns):
-            answer_col = col
-            break
+    # Skip empty rows
+    faqs = faqs.dropna(subset=['question', 'answer'])
+    missing = faqs['language'].isna()
+    if missing.any():
+        faqs['language'] = faqs['language'].fillna(
+            pd.Series(detect_many(faqs.loc[missing, 'question'].astype(str)), index=faqs.index[missing])
+        )
+    for field in ('question', 'answer', 'category', 'language'):
+        faqs[field] = faqs[field].astype(str).str.strip()
     
-    # Find optional category column
-    for col, col_lower in columns_lower.items():
-        if any(pattern in col_lower for pattern in category_patterns):
-            category_col = col
-            break
+    uploaded_at = datetime.now()
+    return {
+        faq_id: {
+            'type': 'faq',
+            'question': question,
+            'answer': answer,
+            'category': category,
+            'language': language,
+            'source_file': source_file,
+            'source_sheet': sheet_name,
+            'uploaded_at': uploaded_at
+        }
+        for faq_id, question, answer, category, language in zip(
+            allocate_faq_ids(len(faqs), existing),
+            faqs['question'].tolist(),
+            faqs['answer'].tolist(),
+            faqs['category'].tolist(),
+            faqs['language'].tolist()
+        )
+    }
+
+def write_faq_entries(knowledge_base: KnowledgeBaseStore, entries: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    Store and index FAQ entries in one batch, unpublished (background job
+    work; the job publishes the result once everything it adds is written).
+    Entries built off the script thread may carry ids taken in the meantime;
+    those are re-allocated.
+    """
+    return knowledge_base.write(entries, fresh_keys=allocate_faq_ids)
+
+def read_faq_entries(source, columns: dict, source_file: str, sheet_name: str,
+                     knowledge_base: KnowledgeBaseStore, job) -> int:
+    """
+    Import an FAQ sheet chunk by chunk (background job work); returns the
+    number of FAQs imported. Only the FAQ columns are read, so memory stays
+    bounded by the chunk size plus the entries themselves. The entries are
+    stored, indexed and published here, in one step for readers.
+    """
+    started = time.perf_counter()
+    faq_columns = [col for col in columns.values() if col]
+    existing = set(knowledge_base)
+    entries = {}
+    # Reading fills the first half of the progress bar, the write the rest
+    for chunk, progress in ExcelProcessor(source, name=source_file).iter_chunks(sheet_name, columns=faq_columns):
+        chunk_entries = build_faq_entries(chunk, columns, source_file, sheet_name, existing)
+        existing.update(chunk_entries)
+        entries.update(chunk_entries)
+        job.report(progress / 2, f"{len(entries):,} FAQs read from '{sheet_name}'")
+    # Last cancellation point: once written, the batch must be published
+    job.report(0.5, f"Writing {len(entries):,} FAQs to the knowledge base…")
+    written = write_faq_entries(knowledge_base, entries)
+    knowledge_base.publish(written)
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    job.complete(f"{len(written):,} FAQs imported ({len(written) / elapsed:,.0f} rows/sec)")
+    return len(written)
+
+def workbook_entry(sheets_data: Dict[str, Dict]) -> Dict:
+    """Knowledge base entry describing a processed workbook"""
+    total_rows = sum(sheet_info['rows'] for sheet_info in sheets_data.values())
     
-    # Find optional language column
-    for col, col_lower in columns_lower.items():
-        if any(pattern in col_lower for pattern in language_patterns):
-            language_col = col
-            break
+    # Store basic info
+    content = f"Excel file with {len(sheets_data)} sheet(s) and {total_rows} total rows.\n\n"
+    for sheet_name, sheet_info in sheets_data.items():
+        content += f"Sheet '{sheet_name}': {sheet_info['rows']} rows, {sheet_info['columns']} columns"
+        if sheet_info['is_faq']:
+            content += f" (FAQ format detected ✓)"
+        content += "\n"
     
-    # Check if we found both required columns
-    is_faq = question_col is not None and answer_col is not None
+    return {
+        'content': content,
+        'type': 'excel',
+        'sheets_data': sheets_data,
+        'total_rows': total_rows,
+        'total_sheets': len(sheets_data),
+        'uploaded_at': datetime.now()
+    }
+
+def process_workbook(source, name: str, knowledge_base: KnowledgeBaseStore, job):
+    """Classify the sheets of an uploaded workbook or CSV and store it (background job work)"""
+    job.report(0.0, "Reading sheet headers")
+    entry = workbook_entry(ExcelProcessor(source, name=name).process())
+    total_faqs_detected = sum(
+        sheet_info['rows'] for sheet_info in entry['sheets_data'].values() if sheet_info['is_faq']
+    )
+    summary = f"{entry['total_sheets']} sheet(s), {entry['total_rows']} total rows"
+    if total_faqs_detected:
+        summary += f", {total_faqs_detected} potential FAQs"
+    # Last cancellation point
+    job.report(1.0, summary)
+    knowledge_base[name] = entry
+
+def process_all_files(futures: Dict[Future, str], knowledge_base: KnowledgeBaseStore, job) -> Dict:
+    """
+    Collect uploaded Knowledge Base files parsed in worker processes
+    ({future: file name}, see submit_parse_tasks) as background job work.
+    Knowledge base entries for the files and for every FAQ found are built,
+    stored and published together here; the per-file report is returned.
+    """
+    started = time.perf_counter()
+    parsed = {}
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            try:
+                parsed[name] = future.result()
+            except Exception as e:
+                parsed[name] = {'error': str(e)}
+            job.report(done / len(futures), f"{done}/{len(futures)} files parsed")
+    except JobCancelled:
+        for future in futures:
+            future.cancel()
+        raise
     
-    columns = {}
-    if is_faq:
-        columns = {
-            'question': question_col,
-            'answer': answer_col,
-            'category': category_col,
-            'language': language_col
-        }
+    existing = set(knowledge_base)
+    files_entries = {}
+    faq_entries = {}
+    report = []
+    for name in futures.values():
+        result = parsed[name]
+        row = {'File': name, 'Type': result.get('type', '-'), 'Rows': 0, 'FAQs': 0,
+               'Parse time (s)': round(result.get('seconds', 0.0), 3), 'Status': '✅ OK'}
+        if 'error' in result:
+            row['Status'] = f"❌ {result['error']}"
+        elif result['type'] == 'excel':
+            entry = workbook_entry(result['sheets_data'])
+            files_entries[name] = entry
+            row['Rows'] = entry['total_rows']
+            for sheet_name, faq_df in result['faq_sheets'].items():
+                columns = result['sheets_data'][sheet_name]['faq_columns']
+                sheet_entries = build_faq_entries(faq_df, columns, name, sheet_name, existing)
+                existing.update(sheet_entries)
+                faq_entries.update(sheet_entries)
+                row['FAQs'] += len(sheet_entries)
+        elif result['type'] == 'text':
+            files_entries[name] = {
+                'content': result['content'],
+                'type': 'text',
+                'size': result['size'],
+                'uploaded_at': datetime.now()
+            }
+        else:
+            files_entries[name] = {
+                'content': f"Document content from {name}",
+                'type': 'document',
+                'uploaded_at': datetime.now()
+            }
+        report.append(row)
     
-    return is_faq, columns
+    elapsed = time.perf_counter() - started
+    parse_total = sum(row['Parse time (s)'] for row in report)
+    # Last cancellation point: once written, the batch must be published
+    job.report(1.0, f"{len(files_entries)}/{len(futures)} files, {len(faq_entries):,} FAQs "
+                    f"({parse_total:.1f}s of parsing across workers)")
+    # File entries and their FAQs become visible in one step
+    knowledge_base.publish({
+        **knowledge_base.write(files_entries),
+        **write_faq_entries(knowledge_base, faq_entries)
+    })
+    return {'report': report, 'elapsed': elapsed}
 
-def import_faqs_from_sheet(df: pd.DataFrame, columns: dict, source_file: str, sheet_name: str):
-    """Import FAQs from a DataFrame into the knowledge base"""
-    imported_count = 0
-    
-    for idx, row in df.iterrows():
-        question = row[columns['question']]
-        answer = row[columns['answer']]
-        
-        # Skip empty rows
-        if pd.isna(question) or pd.isna(answer):
-            continue
-        
-        # Get optional fields
-        category = row[columns['category']] if columns.get('category') and columns['category'] in df.columns else 'General'
-        language = row[columns['language']] if columns.get('language') and columns['language'] in df.columns else 'English'
-        
-        # Handle NaN values
-        if pd.isna(category):
-            category = 'General'
-        if pd.isna(language):
-            language = 'English'
-        
-        # Create unique FAQ ID
-        faq_id = f"FAQ-{str(uuid.uuid4())[:8]}"
-        
-        # Add to knowledge base
-        st.session_state.knowledge_base[faq_id] = {
-            'type': 'faq',
-            'question': str(question).strip(),
-            'answer': str(answer).strip(),
-            'category': str(category).strip(),
-            'language': str(language).strip(),
-            'source_file': source_file,
-            'source_sheet': sheet_name,
-            'uploaded_at': datetime.now()
-        }
-        
-        imported_count += 1
+def show_processing_report(result: Dict):
+    """Keep a processed upload batch's per-file report for this session's Knowledge Base page"""
+    st.session_state.kb_process_report = result['report']
+
+# Module the parse workers run from: parse_kb_file lives there, and the
+# fork server preloads it
+PARSE_WORKER_MODULE = 'excel_processor'
+# Fresh pools tried when submitting finds the parse pool broken
+PARSE_POOL_RETRIES = 1
+
+@st.cache_resource
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Worker processes for parsing Knowledge Base uploads, shared by all sessions"""
+    # Never fork the (multi-threaded) server: workers are forked from a
+    # single-threaded fork server where available, else spawned
+    start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(start_method)
+    if start_method == 'forkserver':
+        context.set_forkserver_preload([PARSE_WORKER_MODULE])
+    return ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=context)
+
+def submit_parse_tasks(files: List[tuple]) -> Dict[Future, str]:
+    """
+    Queue uploaded files ([(name, bytes)]) on the parse pool; returns {future: name}.
+    Call from the script thread (worker processes start inside submit()).
+    A worker that dies (e.g. out of memory) breaks the whole pool: its files
+    fail, and the next submission replaces the pool (BrokenProcessPool is
+    raised once the retries are used up).
+    """
+    for attempt in range(PARSE_POOL_RETRIES + 1):
+        pool = get_parse_pool()
+        try:
+            return {pool.submit(parse_kb_file, name, data): name for name, data in files}
+        except BrokenProcessPool:
+            get_parse_pool.clear()
+            pool.shutdown(wait=False, cancel_futures=True)
+            if attempt == PARSE_POOL_RETRIES:
+                raise
+
+# Background ingestion: workbook processing and FAQ import run on a shared
+# worker pool and write the shared knowledge base themselves; each session
+# keeps a registry of its jobs, which the Knowledge Base page polls, and
+# applies finished results to its own state on its script thread
+INGESTION_WORKERS = 2
+# Knowledge base items listed per page
+KB_PAGE_SIZE = 50
+JOB_POLL_SECONDS = 1.0
+
+class JobCancelled(Exception):
+    """Raised inside job work when cancellation was requested"""
+
+class IngestionJob:
+    """
+    One background ingestion task. The worker reports progress through the job
+    (which is also where cancellation is noticed), writes to the shared
+    knowledge base itself (publishing each batch in one step, so no session
+    sees a partial import, and none has to stay open for it to land) and
+    returns a result. The optional `apply` hands the result to the submitting
+    session's script thread (see apply_finished_jobs), for session-side state.
+    """
+    def __init__(self, key: str, label: str, work: Callable, apply: Callable = None):
+        self.id = uuid.uuid4().hex[:8]
+        self.key = key
+        self.label = label
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = 'Waiting for a worker'
+        self.result = None
+        self.error = None
+        self.elapsed = None
+        self.applied = False
+        self.future = None
+        self._work = work
+        self._apply = apply
+        self._cancel_event = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def run(self):
+        """Worker entry point"""
+        if self._cancel_event.is_set():
+            self.status = 'cancelled'
+            return
+        self.status = 'running'
+        self.message = 'Running'
+        started = time.perf_counter()
+        try:
+            self.result = self._work(self)
+            self.status = 'done'
+        except JobCancelled:
+            self.status = 'cancelled'
+        except Exception as e:
+            self.error = str(e)
+            self.status = 'failed'
+        finally:
+            self.elapsed = time.perf_counter() - started
+
+    def report(self, progress: float = None, message: str = None):
+        """Record progress from the worker; raises JobCancelled once cancellation is requested"""
+        if progress is not None:
+            self.progress = progress
+        if message is not None:
+            self.message = message
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def complete(self, message: str):
+        """Final report from the worker, once its work can no longer be cancelled"""
+        self.progress = 1.0
+        self.message = message
+
+    def cancel(self):
+        """Request cancellation (takes effect at the worker's next report)"""
+        self._cancel_event.set()
+        if self.future is not None and self.future.cancel():
+            self.status = 'cancelled'
+
+    def apply(self):
+        """Apply a finished job's result (script thread only, at most once)"""
+        if self.status == 'done' and not self.applied:
+            self.applied = True
+            if self._apply is not None:
+                self._apply(self.result)
+            # The job stays listed in session state; don't pin the applied batch
+            self.result = None
+
+@st.cache_resource
+def get_ingestion_executor() -> ThreadPoolExecutor:
+    """Worker pool shared by all sessions"""
+    return ThreadPoolExecutor(max_workers=INGESTION_WORKERS, thread_name_prefix='ingestion')
+
+def submit_ingestion_job(key: str, label: str, work: Callable, apply: Callable = None) -> IngestionJob:
+    """Queue `work(job)` on the worker pool; `apply(result)`, if given, runs once it has finished"""
+    job = IngestionJob(key, label, work, apply)
+    st.session_state.ingestion_jobs[job.id] = job
+    job.future = get_ingestion_executor().submit(job.run)
+    return job
+
+def active_job_keys() -> set:
+    """Keys of this session's jobs that are still queued or running"""
+    return {job.key for job in st.session_state.ingestion_jobs.values() if not job.finished}
+
+def apply_finished_jobs():
+    """Apply the results of jobs that finished since the last script run"""
+    for job in st.session_state.ingestion_jobs.values():
+        job.apply()
+
+def render_ingestion_jobs():
+    """Progress, cancel buttons and outcomes of this session's ingestion jobs"""
+    jobs = list(st.session_state.ingestion_jobs.values())
+    if not jobs:
+        return
+    st.write("**⏳ Background Jobs**")
+    for job in jobs:
+        if not job.finished:
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                st.progress(min(job.progress, 1.0), text=f"{job.label}: {job.message}")
+            with col2:
+                if st.button("Cancel", key=f"cancel_job_{job.id}"):
+                    job.cancel()
+        elif job.status == 'done':
+            st.success(f"✅ {job.label}: {job.message} ({job.elapsed:.1f}s)")
+        elif job.status == 'failed':
+            st.error(f"❌ {job.label} failed: {job.error}")
+        else:
+            st.warning(f"🚫 {job.label} cancelled")
     
-    return imported_count
+    # A full rerun shows what a finished job added and applies its result
+    if any(job.status == 'done' and not job.applied for job in jobs):
+        st.rerun()
+    if all(job.finished for job in jobs) and st.button("🧹 Clear finished jobs", key="clear_jobs"):
+        st.session_state.ingestion_jobs = {}
+        st.rerun()
+
+apply_finished_jobs()
 
 # Sidebar Navigation
 st.sidebar.title("🤖 AI Support Agent")
@@ -313,29 +2272,21 @@ st.sidebar.divider()
 st.sidebar.subheader("📊 Dataset")
 uploaded_dataset = st.sidebar.file_uploader(
     "Upload Few_Data_set.xlsx",
-    type=['xlsx', 'xls'],
+    type=['xlsx', 'xls', 'csv'],
     help="Upload your dataset file to enable analytics",
     key="dataset_uploader"
 )
 
 if uploaded_dataset:
     try:
-        # Clear cache when new file is uploaded
-        if 'last_uploaded_file' not in st.session_state or st.session_state['last_uploaded_file'] != uploaded_dataset.name:
-            st.cache_data.clear()
-            st.session_state['last_uploaded_file'] = uploaded_dataset.name
-        
-        # Save uploaded file to session state directly as DataFrame
-        import pandas as pd
-        df_uploaded = pd.read_excel(uploaded_dataset)
-        df_uploaded['query_date'] = pd.to_datetime(df_uploaded['query_date'])
-        st.session_state['uploaded_dataframe'] = df_uploaded
+        # Parse only when the upload content changes; reruns reuse the loaded frame
+        df_uploaded = ingest_uploaded_dataset(uploaded_dataset)
         
         st.sidebar.success(f"✅ Dataset loaded! ({len(df_uploaded)} rows)")
     except Exception as e:
         st.sidebar.error(f"❌ Error loading dataset: {e}")
-        if 'uploaded_dataframe' in st.session_state:
-            del st.session_state['uploaded_dataframe']
+        if 'uploaded_dataset_fingerprint' in st.session_state:
+            del st.session_state['uploaded_dataset_fingerprint']
 
 st.sidebar.divider()
 page = st.sidebar.radio(
@@ -348,43 +2299,35 @@ if page == "🏠 Dashboard":
     st.markdown('<div class="main-header">AI Customer Support Dashboard</div>', unsafe_allow_html=True)
     
     df = load_data()
+    cube = load_cube()
     
-    if df.empty:
+    if df.empty or cube is None:
         show_dataset_upload_help()
     else:
-        # Date filter
+        # Date filter: the cube is date-sorted, so the window is a slice
         col1, col2, col3 = st.columns(3)
-        with col1:
-            date_range = st.selectbox(
-                "Time Period",
-                ["Today", "Last 7 Days", "Last 30 Days", "All Time"]
-            )
-        
-        # Filter data based on date range
-        today = pd.Timestamp.now().normalize()
-        if date_range == "Today":
-            filtered_df = df[df['query_date'] >= today]
-        elif date_range == "Last 7 Days":
-            filtered_df = df[df['query_date'] >= (today - timedelta(days=7))]
-        elif date_range == "Last 30 Days":
-            filtered_df = df[df['query_date'] >= (today - timedelta(days=30))]
-        else:
-            filtered_df = df
+        lo, hi = date_bounds(cube, *select_time_window(cube, "dashboard", col1, col2))
+        filtered_cube = cube.iloc[lo:hi]
         
         # Key Metrics
         st.subheader("📈 Key Metrics")
         col1, col2, col3, col4 = st.columns(4)
         
+        total_queries = int(filtered_cube['count'].sum())
+        escalated = int(filtered_cube['tickets'].sum())
+        stats = dimension_stats(
+            filtered_cube,
+            ['query_category', 'language', 'communication_channel', 'business_unit']
+        )
+        auto_resolved = total_queries - escalated
+        
         with col1:
-            total_queries = len(filtered_df)
             st.metric("Total Queries", total_queries)
         
         with col2:
-            auto_resolved = len(filtered_df[filtered_df['ticket_created'] == 'No'])
             st.metric("Auto-Resolved", auto_resolved)
         
         with col3:
-            escalated = len(filtered_df[filtered_df['ticket_created'] == 'Yes'])
             st.metric("Escalated", escalated)
         
         with col4:
@@ -398,7 +2341,7 @@ if page == "🏠 Dashboard":
         
         with col1:
             st.subheader("📊 Queries by Category")
-            category_counts = filtered_df['query_category'].value_counts()
+            category_counts = stats['query_category']['count'].sort_values(ascending=False)
             fig1 = px.pie(
                 values=category_counts.values,
                 names=category_counts.index,
@@ -409,7 +2352,7 @@ if page == "🏠 Dashboard":
         
         with col2:
             st.subheader("🌐 Language Distribution")
-            lang_counts = filtered_df['language'].value_counts()
+            lang_counts = stats['language']['count'].sort_values(ascending=False)
             fig2 = px.bar(
                 x=lang_counts.index,
                 y=lang_counts.values,
@@ -422,8 +2365,9 @@ if page == "🏠 Dashboard":
         
         # Timeline
         st.subheader("📅 Query Timeline")
-        daily_queries = filtered_df.groupby(filtered_df['query_date'].dt.date).size().reset_index()
+        daily_queries = filtered_cube.groupby('date')['count'].sum().reset_index()
         daily_queries.columns = ['Date', 'Count']
+        daily_queries['Date'] = daily_queries['Date'].dt.date
         fig3 = px.line(
             daily_queries,
             x='Date',
@@ -438,7 +2382,7 @@ if page == "🏠 Dashboard":
         
         with col1:
             st.subheader("📱 Communication Channels")
-            channel_counts = filtered_df['communication_channel'].value_counts()
+            channel_counts = stats['communication_channel']['count'].sort_values(ascending=False)
             fig4 = px.bar(
                 x=channel_counts.index,
                 y=channel_counts.values,
@@ -451,7 +2395,7 @@ if page == "🏠 Dashboard":
         
         with col2:
             st.subheader("🏢 Business Unit Performance")
-            bu_counts = filtered_df['business_unit'].value_counts().head(5)
+            bu_counts = stats['business_unit']['count'].sort_values(ascending=False).head(5)
             fig5 = px.bar(
                 x=bu_counts.values,
                 y=bu_counts.index,
@@ -515,12 +2459,14 @@ elif page == "💬 Chat Support":
         with col_input2:
             language = st.selectbox(
                 "Language",
-                ["English", "Hindi", "Marathi"],
+                ["Auto-detect", "English", "Hindi", "Marathi"],
                 key="language_select"
             )
         
         if st.button("Send", type="primary"):
             if user_query:
+                if language == "Auto-detect":
+                    language = ai_agent.detect_language(user_query)
                 # Add user message to history
                 st.session_state.chat_history.append({
                     'role': 'user',
@@ -575,9 +2521,10 @@ elif page == "💬 Chat Support":
         """)
         
         st.subheader("📋 Recent Categories")
-        df = load_data()
-        if not df.empty:
-            top_categories = df['query_category'].value_counts().head(5)
+        load_data()
+        cube = load_cube()
+        if cube is not None:
+            top_categories = cube_totals(cube, 'query_category')['count'].head(5)
             for cat, count in top_categories.items():
                 st.write(f"• {cat}: {count} queries")
         
@@ -589,13 +2536,18 @@ elif page == "📊 Analytics":
     st.markdown('<div class="main-header">Advanced Analytics</div>', unsafe_allow_html=True)
     
     df = load_data()
+    cube = load_cube()
     
-    if df.empty:
+    if df.empty or cube is None:
         st.warning("⚠️ No data available. Please upload the dataset file from the sidebar.")
         st.info("Upload **Few_Data_set.xlsx** in the sidebar to view analytics.")
     else:
         # Filters
         st.subheader("🔍 Filters")
+        col1, col2, col3 = st.columns(3)
+        start, end = select_time_window(cube, "analytics", col1, col2, default="All Time")
+        lo, hi = date_bounds(cube, start, end)
+        
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
@@ -626,13 +2578,15 @@ elif page == "📊 Analytics":
                 default=df['query_category'].unique()
             )
         
-        # Apply filters
-        filtered_df = df[
-            (df['business_unit'].isin(selected_bu)) &
-            (df['communication_channel'].isin(selected_channel)) &
-            (df['language'].isin(selected_lang)) &
-            (df['query_category'].isin(selected_category))
-        ]
+        # Apply filters to the metrics cube through the bitmap index
+        filter_mask = load_filter_index().mask({
+            'business_unit': selected_bu,
+            'communication_channel': selected_channel,
+            'language': selected_lang,
+            'query_category': selected_category
+        })
+        window = cube.iloc[lo:hi]
+        filtered_cube = window[filter_mask[lo:hi]]
         
         st.divider()
         
@@ -641,16 +2595,22 @@ elif page == "📊 Analytics":
         
         col1, col2, col3, col4, col5 = st.columns(5)
         
+        total = int(filtered_cube['count'].sum())
+        tickets = int(filtered_cube['tickets'].sum())
+        # All per-dimension stats for the current filter in one pass
+        stats = dimension_stats(
+            filtered_cube,
+            ['query_category', 'communication_channel', 'business_unit']
+        )
+        auto_resolved = total - tickets
+        
         with col1:
-            total = len(filtered_df)
             st.metric("Total Queries", total)
         
         with col2:
-            auto_resolved = len(filtered_df[filtered_df['ticket_created'] == 'No'])
             st.metric("Auto-Resolved", auto_resolved)
         
         with col3:
-            tickets = len(filtered_df[filtered_df['ticket_created'] == 'Yes'])
             st.metric("Tickets Created", tickets)
         
         with col4:
@@ -659,22 +2619,20 @@ elif page == "📊 Analytics":
                      delta=f"{resolution - 70:.1f}%" if resolution > 70 else f"{resolution - 70:.1f}%")
         
         with col5:
-            avg_per_day = total / 30 if total > 0 else 0
+            avg_per_day = total / window_day_count(cube, start, end)
             st.metric("Avg Queries/Day", f"{avg_per_day:.1f}")
         
         st.divider()
         
         # Detailed Charts
-        tab1, tab2, tab3, tab4 = st.tabs(["📊 Category Analysis", "🌐 Language & Channel", "📅 Time Analysis", "🏢 Business Units"])
+        tab1, tab2, tab3, tab4, tab5 = st.tabs(["📊 Category Analysis", "🌐 Language & Channel", "📅 Time Analysis", "🏢 Business Units", "🔁 What-if Replay"])
         
         with tab1:
             col1, col2 = st.columns(2)
             
             with col1:
                 # Category breakdown
-                cat_ticket = filtered_df.groupby('query_category')['ticket_created'].apply(
-                    lambda x: (x == 'Yes').sum()
-                ).reset_index()
+                cat_ticket = stats['query_category']['tickets'].reset_index()
                 cat_ticket.columns = ['Category', 'Tickets']
                 
                 fig = px.bar(
@@ -689,9 +2647,7 @@ elif page == "📊 Analytics":
             
             with col2:
                 # Resolution rate by category
-                cat_stats = filtered_df.groupby('query_category').agg({
-                    'ticket_created': lambda x: ((x == 'No').sum() / len(x) * 100)
-                }).reset_index()
+                cat_stats = stats['query_category']['resolution_rate'].reset_index()
                 cat_stats.columns = ['Category', 'Resolution Rate']
                 
                 fig = px.bar(
@@ -709,7 +2665,7 @@ elif page == "📊 Analytics":
             
             with col1:
                 # Language distribution
-                lang_channel = filtered_df.groupby(['language', 'communication_channel']).size().reset_index()
+                lang_channel = cube_totals(filtered_cube, ['language', 'communication_channel'], largest_first=False)['count'].reset_index()
                 lang_channel.columns = ['Language', 'Channel', 'Count']
                 
                 fig = px.sunburst(
@@ -722,10 +2678,7 @@ elif page == "📊 Analytics":
             
             with col2:
                 # Channel effectiveness
-                channel_stats = filtered_df.groupby('communication_channel').agg({
-                    'record_id': 'count',
-                    'ticket_created': lambda x: ((x == 'No').sum() / len(x) * 100)
-                }).reset_index()
+                channel_stats = stats['communication_channel'][['count', 'resolution_rate']].reset_index()
                 channel_stats.columns = ['Channel', 'Total Queries', 'Resolution Rate']
                 
                 fig = go.Figure()
@@ -752,7 +2705,7 @@ elif page == "📊 Analytics":
         
         with tab3:
             # Monthly trend
-            monthly = filtered_df.groupby(filtered_df['query_date'].dt.to_period('M')).size().reset_index()
+            monthly = filtered_cube.groupby(filtered_cube['date'].dt.to_period('M'))['count'].sum().reset_index()
             monthly.columns = ['Month', 'Count']
             monthly['Month'] = monthly['Month'].astype(str)
             
@@ -766,9 +2719,7 @@ elif page == "📊 Analytics":
             st.plotly_chart(fig, use_container_width=True)
             
             # Day of week analysis
-            filtered_df['day_of_week'] = filtered_df['query_date'].dt.day_name()
-            dow_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-            dow_counts = filtered_df['day_of_week'].value_counts().reindex(dow_order, fill_value=0)
+            dow_counts = filtered_cube.groupby('day_of_week', observed=False)['count'].sum().reindex(DAY_OF_WEEK_ORDER, fill_value=0)
             
             fig = px.bar(
                 x=dow_counts.index,
@@ -782,10 +2733,7 @@ elif page == "📊 Analytics":
         
         with tab4:
             # Top business units
-            bu_stats = filtered_df.groupby('business_unit').agg({
-                'record_id': 'count',
-                'ticket_created': lambda x: ((x == 'Yes').sum() / len(x) * 100)
-            }).reset_index()
+            bu_stats = stats['business_unit'][['count', 'escalation_rate']].reset_index()
             bu_stats.columns = ['Business Unit', 'Total Queries', 'Escalation Rate']
             bu_stats = bu_stats.sort_values('Total Queries', ascending=False).head(10)
             
@@ -813,6 +2761,82 @@ elif page == "📊 Analytics":
             except ImportError:
                 # Fallback without styling if matplotlib not available
                 st.dataframe(bu_stats, use_container_width=True)
+        
+        with tab5:
+            # Replay the whole query log (filters not applied) through the agent
+            st.caption("Re-answer every logged query with the current knowledge base and compare with the recorded outcomes")
+            missing = [column for column in REPLAY_COLUMNS if column not in df.columns]
+            if missing:
+                st.info(f"The dataset needs these columns for a replay: {', '.join(missing)}")
+            else:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    replay_threshold = st.slider(
+                        "Confidence Threshold",
+                        min_value=0.0,
+                        max_value=1.0,
+                        value=st.session_state.confidence_threshold,
+                        step=0.05,
+                        key="replay_threshold"
+                    )
+                with col2:
+                    replay_semantic = st.checkbox(
+                        "Semantic FAQ Matching",
+                        value=st.session_state.semantic_matching,
+                        key="replay_semantic"
+                    )
+                with col3:
+                    if st.button("▶️ Run replay", type="primary"):
+                        # The semantic index is only held for the replay itself
+                        replay_handle = get_shared_semantic_index().acquire() if replay_semantic else None
+                        try:
+                            replay_agent = SimpleAIAgent(
+                                st.session_state.knowledge_base,
+                                faq_index=get_faq_index(),
+                                semantic_index=replay_handle.index if replay_handle else None
+                            )
+                            replay_agent.confidence_threshold = replay_threshold
+                            with st.spinner(f"Replaying {len(df):,} queries..."):
+                                st.session_state.replay_result = replay_query_log(df, replay_agent)
+                        finally:
+                            if replay_handle:
+                                replay_handle.release()
+                
+                result = st.session_state.get('replay_result')
+                if result:
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("Queries Replayed", f"{result['queries']:,}")
+                    with col2:
+                        st.metric(
+                            "Predicted Resolution",
+                            f"{result['predicted_resolution'] * 100:.1f}%",
+                            delta=f"{(result['predicted_resolution'] - result['recorded_resolution']) * 100:.1f}% vs recorded"
+                        )
+                    with col3:
+                        st.metric("Category Agreement", f"{result['category_agreement'] * 100:.1f}%")
+                    with col4:
+                        st.metric("Escalation Agreement", f"{result['outcome_agreement'] * 100:.1f}%")
+                    
+                    rate = result['queries'] / result['elapsed'] * 60 if result['elapsed'] > 0 else 0
+                    st.caption(
+                        f"Threshold {result['threshold']:.2f}, semantic matching {'on' if result['semantic'] else 'off'} · "
+                        f"recorded resolution {result['recorded_resolution'] * 100:.1f}% · "
+                        f"{result['elapsed']:.2f}s ({rate:,.0f} queries/min)"
+                    )
+                    
+                    fig = px.imshow(
+                        result['category_confusion'],
+                        text_auto=True,
+                        aspect='auto',
+                        labels=dict(x="Predicted Category", y="Recorded Category", color="Queries"),
+                        title="Category Confusion (recorded vs predicted)",
+                        color_continuous_scale='Blues'
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+                    
+                    st.subheader("🎯 Outcome Confusion")
+                    st.dataframe(result['outcome_confusion'], use_container_width=True)
 
 elif page == "🎫 Tickets":
     st.markdown('<div class="main-header">Ticket Management System</div>', unsafe_allow_html=True)
@@ -850,7 +2874,7 @@ elif page == "🎫 Tickets":
         st.subheader("📊 Historical Tickets")
         df = load_data()
         if not df.empty:
-            tickets_df = df[df['ticket_created'] == 'Yes']
+            tickets_df = df[df['ticket_created']]
             st.dataframe(
                 tickets_df[['query_date', 'business_unit', 'customer_query', 'query_category', 'language']],
                 use_container_width=True
@@ -901,7 +2925,7 @@ elif page == "📚 Knowledge Base":
         📤 **Supported File Types:**
         - 📄 **PDF**: Product manuals, brochures, documentation
         - 📝 **DOCX**: Word documents, reports, guides
-        - 📊 **XLSX/XLS**: Excel spreadsheets with data, FAQs, product lists
+        - 📊 **XLSX/XLS/CSV**: Excel spreadsheets or CSV exports with data, FAQs, product lists
         - 📋 **TXT**: Plain text files, notes, transcripts
         
         **Maximum file size:** 200MB per file
@@ -913,111 +2937,50 @@ elif page == "📚 Knowledge Base":
             st.write("**📄 Upload Files**")
             uploaded_files = st.file_uploader(
                 "Upload PDFs, DOCX, TXT, or XLSX files",
-                type=['pdf', 'docx', 'txt', 'xlsx', 'xls'],
+                type=['pdf', 'docx', 'txt', 'xlsx', 'xls', 'csv'],
                 accept_multiple_files=True,
-                help="Supported formats: PDF, DOCX, TXT, XLSX, XLS (max 200MB per file)"
+                help="Supported formats: PDF, DOCX, TXT, XLSX, XLS, CSV (max 200MB per file)"
             )
             
             if uploaded_files:
+                # Process all: files are parsed in parallel worker processes and
+                # committed (with every FAQ they contain) in one batch
+                if len(uploaded_files) > 1:
+                    process_all_key = "process_all_files"
+                    if st.button(f"⚡ Process all {len(uploaded_files)} files", key=process_all_key,
+                                 type="primary", disabled=process_all_key in active_job_keys()):
+                        try:
+                            futures = submit_parse_tasks([(file.name, file.getvalue()) for file in uploaded_files])
+                        except BrokenProcessPool as e:
+                            st.error(f"❌ Could not start the file parsing workers: {e}")
+                        else:
+                            submit_ingestion_job(
+                                process_all_key,
+                                f"Processing {len(uploaded_files)} files",
+                                partial(process_all_files, futures, st.session_state.knowledge_base),
+                                show_processing_report
+                            )
+                    if st.session_state.get('kb_process_report'):
+                        with st.expander("⏱️ Per-file processing report", expanded=True):
+                            st.dataframe(pd.DataFrame(st.session_state.kb_process_report), use_container_width=True)
+                
                 for file in uploaded_files:
                     st.success(f"✅ {file.name} uploaded successfully!")
                     
-                    # Process the file based on type
-                    if st.button(f"📊 Process {file.name}", key=f"process_{file.name}", type="primary"):
+                    # Process the file based on type; workbooks are read by a background job
+                    active_keys = active_job_keys()
+                    process_key = f"process_{file.name}"
+                    if st.button(f"📊 Process {file.name}", key=process_key, type="primary",
+                                 disabled=process_key in active_keys):
                         try:
-                            if file.name.endswith(('.xlsx', '.xls', '.xlsm')):
-                                # Process Excel file
-                                import pandas as pd
-                                
-                                with st.spinner(f"Processing {file.name}..."):
-                                    # Read all sheets
-                                    excel_file = pd.ExcelFile(file)
-                                    sheet_names = excel_file.sheet_names
-                                    
-                                    st.info(f"📑 Found {len(sheet_names)} sheet(s): {', '.join(sheet_names)}")
-                                    
-                                    total_rows = 0
-                                    total_faqs_detected = 0
-                                    sheets_data = {}
-                                    
-                                    # Process each sheet
-                                    for sheet_name in sheet_names:
-                                        df = pd.read_excel(file, sheet_name=sheet_name)
-                                        total_rows += len(df)
-                                        
-                                        # Check if this sheet looks like FAQ data
-                                        is_faq, faq_columns = detect_faq_columns(df)
-                                        
-                                        sheets_data[sheet_name] = {
-                                            'df': df,
-                                            'is_faq': is_faq,
-                                            'faq_columns': faq_columns,
-                                            'rows': len(df),
-                                            'columns': len(df.columns)
-                                        }
-                                        
-                                        if is_faq:
-                                            total_faqs_detected += len(df)
-                                    
-                                    # Store basic info
-                                    content = f"Excel file with {len(sheet_names)} sheet(s) and {total_rows} total rows.\n\n"
-                                    for sheet_name, sheet_info in sheets_data.items():
-                                        content += f"Sheet '{sheet_name}': {sheet_info['rows']} rows, {sheet_info['columns']} columns"
-                                        if sheet_info['is_faq']:
-                                            content += f" (FAQ format detected ✓)"
-                                        content += "\n"
-                                    
-                                    st.session_state.knowledge_base[file.name] = {
-                                        'content': content,
-                                        'type': 'excel',
-                                        'sheets_data': sheets_data,
-                                        'total_rows': total_rows,
-                                        'total_sheets': len(sheet_names),
-                                        'uploaded_at': datetime.now()
-                                    }
-                                    
-                                    st.success(f"✅ Processed {file.name} - {total_rows} total rows")
-                                    
-                                    # Show FAQ detection results
-                                    if total_faqs_detected > 0:
-                                        st.balloons()
-                                        st.success(f"🎉 **FAQ Auto-Detection**: Found {total_faqs_detected} potential FAQs!")
-                                        
-                                        # Create expandable sections for each FAQ sheet
-                                        for sheet_name, sheet_info in sheets_data.items():
-                                            if sheet_info['is_faq']:
-                                                with st.expander(f"📋 Sheet: '{sheet_name}' - {len(sheet_info['df'])} FAQs Detected", expanded=True):
-                                                    cols = sheet_info['faq_columns']
-                                                    st.write(f"**Question Column:** `{cols['question']}`")
-                                                    st.write(f"**Answer Column:** `{cols['answer']}`")
-                                                    if cols.get('category'):
-                                                        st.write(f"**Category Column:** `{cols['category']}`")
-                                                    if cols.get('language'):
-                                                        st.write(f"**Language Column:** `{cols['language']}`")
-                                                    
-                                                    # Preview first 3 FAQs
-                                                    st.write("**Preview (First 3 FAQs):**")
-                                                    preview_df = sheet_info['df'][[cols['question'], cols['answer']]].head(3)
-                                                    st.dataframe(preview_df, use_container_width=True)
-                                                    
-                                                    # Import button
-                                                    import_key = f"import_{file.name}_{sheet_name}"
-                                                    if st.button(f"✨ Import {len(sheet_info['df'])} FAQs from '{sheet_name}'", 
-                                                               key=import_key, 
-                                                               type="primary"):
-                                                        import_faqs_from_sheet(
-                                                            sheet_info['df'], 
-                                                            cols, 
-                                                            file.name, 
-                                                            sheet_name
-                                                        )
-                                                        st.success(f"✅ Successfully imported {len(sheet_info['df'])} FAQs!")
-                                                        st.rerun()
-                                    else:
-                                        st.info("ℹ️ No FAQ format detected. File stored as general data.")
-                                        st.write("**Tip:** For FAQ auto-detection, ensure your Excel has columns named:")
-                                        st.write("- `Question` or `Q` or `Query`")
-                                        st.write("- `Answer` or `A` or `Response`")
+                            if file.name.endswith(WORKBOOK_EXTENSIONS):
+                                submit_ingestion_job(
+                                    process_key,
+                                    f"Processing {file.name}",
+                                    partial(process_workbook, io.BytesIO(file.getvalue()), file.name,
+                                            st.session_state.knowledge_base)
+                                )
+                                st.info(f"⏳ Processing {file.name} in the background...")
                                 
                             elif file.name.endswith('.txt'):
                                 # Process text file
@@ -1052,6 +3015,43 @@ elif page == "📚 Knowledge Base":
                         except Exception as e:
                             st.error(f"❌ Error processing {file.name}: {str(e)}")
                             st.exception(e)
+                    
+                    # FAQ import for processed workbooks (outside the Process branch so the
+                    # import button survives the rerun its own click triggers)
+                    processed = st.session_state.knowledge_base.get(file.name)
+                    if processed and processed.get('type') == 'excel':
+                        faq_sheets = {name: info for name, info in processed['sheets_data'].items() if info['is_faq']}
+                        if not faq_sheets:
+                            st.info("ℹ️ No FAQ format detected. File stored as general data.")
+                            st.write("**Tip:** For FAQ auto-detection, ensure your Excel has columns named:")
+                            st.write("- `Question` or `Q` or `Query`")
+                            st.write("- `Answer` or `A` or `Response`")
+                        for sheet_name, sheet_info in faq_sheets.items():
+                            with st.expander(f"📋 Sheet: '{sheet_name}' - {sheet_info['rows']} FAQs Detected", expanded=True):
+                                cols = sheet_info['faq_columns']
+                                st.write(f"**Question Column:** `{cols['question']}`")
+                                st.write(f"**Answer Column:** `{cols['answer']}`")
+                                if cols.get('category'):
+                                    st.write(f"**Category Column:** `{cols['category']}`")
+                                if cols.get('language'):
+                                    st.write(f"**Language Column:** `{cols['language']}`")
+                                
+                                # Preview first 3 FAQs
+                                st.write("**Preview (First 3 FAQs):**")
+                                st.dataframe(sheet_info['preview'], use_container_width=True)
+                                
+                                # Import button: the sheet is streamed in chunks by a background job
+                                import_key = f"import_{file.name}_{sheet_name}"
+                                if st.button(f"✨ Import {sheet_info['rows']} FAQs from '{sheet_name}'", 
+                                           key=import_key, 
+                                           type="primary",
+                                           disabled=import_key in active_keys):
+                                    submit_ingestion_job(
+                                        import_key,
+                                        f"Importing '{sheet_name}' from {file.name}",
+                                        partial(read_faq_entries, io.BytesIO(file.getvalue()), cols, file.name,
+                                                sheet_name, st.session_state.knowledge_base)
+                                    )
                 
                 st.divider()
                 st.info("""
@@ -1061,6 +3061,10 @@ elif page == "📚 Knowledge Base":
                 - Each row = one FAQ
                 - Supports multiple sheets with different FAQ sets
                 """)
+            
+            # Background jobs poll while any of them is still queued or running
+            run_every = JOB_POLL_SECONDS if active_job_keys() else None
+            st.fragment(render_ingestion_jobs, run_every=run_every)()
 
         
         with col2:
@@ -1132,14 +3136,21 @@ elif page == "📚 Knowledge Base":
                 ["All", "FAQs Only", "Files Only"]
             )
             
-            # Display items
-            for key, value in st.session_state.knowledge_base.items():
-                # Apply filter
-                if filter_type == "FAQs Only" and value.get('type') != 'faq':
-                    continue
-                elif filter_type == "Files Only" and value.get('type') == 'faq':
-                    continue
-                
+            # Apply filter
+            items = [
+                (key, value) for key, value in st.session_state.knowledge_base.items()
+                if not (filter_type == "FAQs Only" and value.get('type') != 'faq')
+                and not (filter_type == "Files Only" and value.get('type') == 'faq')
+            ]
+            
+            # Display items a page at a time (bulk imports add thousands of FAQs)
+            page_count = max(1, -(-len(items) // KB_PAGE_SIZE))
+            if page_count > 1:
+                kb_page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, key="kb_page")
+            else:
+                kb_page = 1
+            start = (kb_page - 1) * KB_PAGE_SIZE
+            for key, value in items[start:start + KB_PAGE_SIZE]:
                 # Choose icon based on type
                 if value.get('type') == 'faq':
                     icon = "❓"
@@ -1211,7 +3222,7 @@ elif page == "📚 Knowledge Base":
                     
                     # Delete option
                     if st.button(f"🗑️ Delete {key}", key=f"delete_{key}", type="secondary"):
-                        del st.session_state.knowledge_base[key]
+                        st.session_state.knowledge_base.pop(key)
                         st.success(f"Deleted {key}")
                         st.rerun()
         else:
@@ -1224,24 +3235,39 @@ elif page == "📚 Knowledge Base":
     
     with tab3:
         st.subheader("🔍 Search Knowledge Base")
-        search_query = st.text_input("Search for information...")
+        search_query = st.text_input(
+            "Search for information...",
+            help='Use "quotes" for an exact phrase and word* for any word starting with word'
+        )
         
         if search_query:
             st.write(f"Searching for: **{search_query}**")
             
-            # Simple search simulation
-            results = []
-            for key, value in st.session_state.knowledge_base.items():
-                if value.get('type') == 'faq':
-                    if search_query.lower() in value['question'].lower() or search_query.lower() in value['answer'].lower():
-                        results.append((key, value))
+            # Indexed, ranked lookup; only the requested page is materialized
+            page_number = st.session_state.get('kb_search_page', 1)
+            started = time.perf_counter()
+            hits, total = search_knowledge_base(search_query, page=page_number)
+            if not hits and total:
+                # The query changed and has fewer pages: start over
+                st.session_state.kb_search_page = page_number = 1
+                hits, total = search_knowledge_base(search_query)
+            elapsed_ms = (time.perf_counter() - started) * 1000
             
-            if results:
-                st.success(f"Found {len(results)} result(s)")
-                for key, value in results:
+            if hits:
+                page_count = -(-total // KB_SEARCH_PAGE_SIZE)
+                st.success(f"Found {total} result(s) in {elapsed_ms:.1f} ms (best matches first)")
+                for key, score in hits:
+                    value = st.session_state.knowledge_base.get(key)
+                    if value is None:
+                        # Indexed by an import that isn't published yet
+                        continue
                     st.write(f"**Q:** {value['question']}")
                     st.write(f"**A:** {value['answer']}")
+                    st.caption(f"📁 {value.get('category', 'General')} · relevance {score:.2f}")
                     st.divider()
+                if page_count > 1:
+                    st.number_input(f"Results page (of {page_count})", min_value=1, max_value=page_count,
+                                    key="kb_search_page")
             else:
                 st.warning("No results found")
 
@@ -1256,12 +3282,12 @@ elif page == "⚙️ Settings":
         col1, col2 = st.columns(2)
         
         with col1:
-            confidence_threshold = st.slider(
+            st.slider(
                 "Confidence Threshold for Escalation",
                 min_value=0.0,
                 max_value=1.0,
-                value=0.7,
                 step=0.05,
+                key="confidence_threshold",
                 help="Queries with confidence below this threshold will be escalated"
             )
             
@@ -1281,12 +3307,31 @@ elif page == "⚙️ Settings":
             enable_auto_translation = st.checkbox("Enable Auto-Translation", value=True)
             enable_sentiment_analysis = st.checkbox("Enable Sentiment Analysis", value=True)
             enable_ocr = st.checkbox("Enable OCR for Images", value=False)
+            st.checkbox(
+                "Semantic FAQ Matching",
+                key="semantic_matching",
+                help="Also match FAQs worded differently from the query, by meaning (local embeddings, no network)"
+            )
             
             st.write("**Supported Languages:**")
             st.checkbox("English", value=True, disabled=True)
             st.checkbox("Hindi", value=True)
             st.checkbox("Marathi", value=True)
         
+        cache_stats = get_response_cache().stats()
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.caption(
+                f"💾 Response cache: {cache_stats['hit_rate']:.0%} hit rate "
+                f"({cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses), "
+                f"{cache_stats['size']:,} cached responses, {cache_stats['evictions']:,} evicted, "
+                f"{cache_stats['invalidations']:,} invalidation(s) after knowledge base or intent rule changes"
+            )
+        with col2:
+            if st.button("Clear Response Cache"):
+                get_response_cache().clear()
+                st.rerun()
+        
         if st.button("Save AI Configuration", type="primary"):
             st.success("✅ Configuration saved successfully!")
     
@@ -0,0 +1,268 @@
+"""
+Workbook processing for the Knowledge Base page and dataset uploads:
+FAQ sheet detection, single-pass reading of multi-sheet Excel workbooks,
+streaming (chunked) reads of large workbooks and CSV files, and the
+per-file parse function run by the Knowledge Base worker processes.
+"""
+import io
+import time
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
+
+import openpyxl
+import pandas as pd
+
+# Rows per chunk for streaming reads
+CHUNK_SIZE = 50_000
+# CSV files are handled as a workbook with this single sheet
+CSV_SHEET_NAME = 'CSV'
+# Knowledge Base uploads parsed as workbooks
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xls', '.xlsm', '.csv')
+
+def detect_faq_columns(df: pd.DataFrame) -> tuple:
+    """
+    Detect if a DataFrame contains FAQ data
+    Returns: (is_faq: bool, columns: dict)
+    """
+    columns_lower = {col: col.lower().strip() for col in df.columns}
+    
+    # Possible question column names
+    question_patterns = ['question', 'q', 'query', 'faq', 'questions', 'ask']
+    # Possible answer column names
+    answer_patterns = ['answer', 'a', 'response', 'reply', 'answers', 'solution']
+    # Optional columns
+    category_patterns = ['category', 'type', 'topic', 'group']
+    language_patterns = ['language', 'lang', 'locale']
+    
+    question_col = None
+    answer_col = None
+    category_col = None
+    language_col = None
+    
+    # Find question column
+    for col, col_lower in columns_lower.items():
+        if any(pattern in col_lower for pattern in question_patterns):
+            question_col = col
+            break
+    
+    # Find answer column
+    for col, col_lower in columns_lower.items():
+        if any(pattern in col_lower for pattern in answer_patterns):
+            answer_col = col
+            break
+    
+    # Find optional category column
+    for col, col_lower in columns_lower.items():
+        if any(pattern in col_lower for pattern in category_patterns):
+            category_col = col
+            break
+    
+    # Find optional language column
+    for col, col_lower in columns_lower.items():
+        if any(pattern in col_lower for pattern in language_patterns):
+            language_col = col
+            break
+    
+    # Check if we found both required columns
+    is_faq = question_col is not None and answer_col is not None
+    
+    columns = {}
+    if is_faq:
+        columns = {
+            'question': question_col,
+            'answer': answer_col,
+            'category': category_col,
+            'language': language_col
+        }
+    
+    return is_faq, columns
+
+class ExcelProcessor:
+    """
+    Processes an uploaded workbook (or CSV file) without materializing it.
+    process() classifies sheets from their header row and keeps only a small
+    preview of each; iter_chunks() then streams the rows of one sheet in
+    fixed-size DataFrame chunks, so peak memory is bounded by the chunk size.
+    .xlsx files are streamed with openpyxl's read-only reader and CSV files
+    with pandas chunked reads; legacy .xls files (at most 65k rows) are
+    parsed whole and then split into chunks.
+    """
+    def __init__(self, source, preview_rows: int = 3, name: str = None):
+        self.source = source
+        self.preview_rows = preview_rows
+        self.name = name or getattr(source, 'name', str(source))
+        lowered = self.name.lower()
+        self.is_csv = lowered.endswith('.csv')
+        self.is_xls = lowered.endswith('.xls')
+
+    def process(self) -> Dict[str, Dict]:
+        """Return {sheet_name: sheet_info} in workbook order"""
+        if self.is_csv:
+            return {CSV_SHEET_NAME: self._csv_sheet_info()}
+        if self.is_xls:
+            self._rewind()
+            sheets = pd.read_excel(self.source, sheet_name=None)
+            return {
+                sheet_name: self._sheet_info([str(col) for col in df.columns], df.head(self.preview_rows), len(df))
+                for sheet_name, df in sheets.items()
+            }
+
+        self._rewind()
+        workbook = openpyxl.load_workbook(self.source, read_only=True, data_only=True)
+        try:
+            sheets_data = {}
+            for sheet in workbook.worksheets:
+                header, rows, data_rows = self._sheet_rows(sheet)
+                preview = pd.DataFrame(list(islice(rows, self.preview_rows)), columns=header)
+                if data_rows is None:
+                    # No dimension record in the sheet: count the remaining rows
+                    data_rows = len(preview) + sum(1 for _ in rows)
+                sheets_data[sheet.title] = self._sheet_info(header, preview, data_rows)
+            return sheets_data
+        finally:
+            workbook.close()
+
+    def iter_chunks(self, sheet_name: str = None, columns: List[str] = None,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[pd.DataFrame, float]]:
+        """
+        Yield (chunk, progress) pairs for one sheet (the first sheet by default),
+        optionally restricted to those of `columns` the sheet has. progress is
+        the fraction of the sheet read so far, or None when the size is unknown.
+        """
+        self._rewind()
+        if self.is_csv:
+            yield from self._iter_csv_chunks(columns, chunk_size)
+        elif self.is_xls:
+            df = pd.read_excel(self.source, sheet_name=sheet_name or 0)
+            df.columns = [str(col) for col in df.columns]
+            if columns is not None:
+                df = df[[col for col in df.columns if col in columns]]
+            if df.empty:
+                yield df, 1.0
+            for start in range(0, len(df), chunk_size):
+                yield df.iloc[start:start + chunk_size], min(1.0, (start + chunk_size) / len(df))
+        else:
+            yield from self._iter_xlsx_chunks(sheet_name, columns, chunk_size)
+
+    def _iter_xlsx_chunks(self, sheet_name, columns, chunk_size):
+        workbook = openpyxl.load_workbook(self.source, read_only=True, data_only=True)
+        try:
+            sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+            header, rows, data_rows = self._sheet_rows(sheet)
+            positions = [i for i, name in enumerate(header) if columns is None or name in columns]
+            names = [header[i] for i in positions]
+    
+            read = 0
+            batch = []
+            for row in rows:
+                batch.append(tuple(row[i] for i in positions))
+                if len(batch) >= chunk_size:
+                    read += len(batch)
+                    yield pd.DataFrame(batch, columns=names), self._progress(read, data_rows)
+                    batch = []
+            if batch or not read:
+                read += len(batch)
+                yield pd.DataFrame(batch, columns=names), 1.0
+        finally:
+            workbook.close()
+
+    def _iter_csv_chunks(self, columns, chunk_size):
+        data_rows = self._csv_line_count() - 1
+        self._rewind()
+        wanted = None if columns is None else set(columns)
+        usecols = None if wanted is None else (lambda col: col in wanted)
+        read = 0
+        for chunk in pd.read_csv(self.source, usecols=usecols, chunksize=chunk_size):
+            read += len(chunk)
+            yield chunk, self._progress(read, data_rows)
+
+    def _csv_sheet_info(self) -> Dict:
+        self._rewind()
+        preview = pd.read_csv(self.source, nrows=self.preview_rows)
+        data_rows = max(self._csv_line_count() - 1, len(preview))
+        return self._sheet_info([str(col) for col in preview.columns], preview, data_rows)
+
+    def _csv_line_count(self) -> int:
+        # Line count as the row estimate (quoted multi-line cells are rare in FAQ exports)
+        if hasattr(self.source, 'getvalue'):
+            return self.source.getvalue().count(b'\n')
+        with open(self.source, 'rb') as handle:
+            return sum(block.count(b'\n') for block in iter(lambda: handle.read(1 << 20), b''))
+
+    def _sheet_info(self, header: List[str], preview: pd.DataFrame, data_rows: int) -> Dict:
+        is_faq, faq_columns = detect_faq_columns(pd.DataFrame(columns=header))
+        sheet_info = {
+            'is_faq': is_faq,
+            'faq_columns': faq_columns,
+            'rows': data_rows,
+            'columns': len(header)
+        }
+        if is_faq:
+            sheet_info['preview'] = preview[[faq_columns['question'], faq_columns['answer']]]
+        else:
+            sheet_info['preview'] = preview
+        return sheet_info
+
+    def _sheet_rows(self, sheet) -> Tuple[List[str], Iterator[tuple], int]:
+        """Header names, an iterator over non-empty data rows and the recorded data row count"""
+        # Read the recorded dimension before iterating; it may be missing (None)
+        max_row = sheet.max_row
+        rows = sheet.iter_rows(values_only=True)
+        header = header_names(next(rows, ()))
+        data_rows = None if max_row is None else max(max_row - 1, 0)
+        width = len(header)
+        padding = (None,) * width
+        data = (
+            (row + padding)[:width] if len(row) != width else row
+            for row in rows if any(value is not None for value in row)
+        )
+        return header, data, data_rows
+
+    def _progress(self, done, total):
+        return min(1.0, done / total) if total else None
+
+    def _rewind(self):
+        if hasattr(self.source, 'seek'):
+            self.source.seek(0)
+
+
+def header_names(values) -> List[str]:
+    """Column names for a header row, named and de-duplicated like pandas does"""
+    names = []
+    seen: Dict[str, int] = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None or str(value).strip() == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def parse_kb_file(name: str, data: bytes) -> Dict:
+    """
+    Parse one uploaded Knowledge Base file; runs in a worker process, so it
+    only takes and returns picklable values. Workbooks come back with their
+    sheet info and the FAQ columns of every FAQ sheet ('faq_sheets'), text
+    files with their decoded content. 'seconds' is the time spent parsing.
+    """
+    started = time.perf_counter()
+    lowered = name.lower()
+    result = {'faq_sheets': {}}
+    if lowered.endswith(WORKBOOK_EXTENSIONS):
+        processor = ExcelProcessor(io.BytesIO(data), name=name)
+        sheets_data = processor.process()
+        for sheet_name, sheet_info in sheets_data.items():
+            if sheet_info['is_faq']:
+                columns = [col for col in sheet_info['faq_columns'].values() if col]
+                chunks = [chunk for chunk, _ in processor.iter_chunks(sheet_name, columns=columns)]
+                result['faq_sheets'][sheet_name] = pd.concat(chunks, ignore_index=True)
+        result.update(type='excel', sheets_data=sheets_data)
+    elif lowered.endswith('.txt'):
+        content = data.decode('utf-8')
+        result.update(type='text', content=content, size=len(content))
+    else:
+        result.update(type='document')
+    result['seconds'] = time.perf_counter() - started
+    return result
@@ -0,0 +1,265 @@
+"""
+Persistent knowledge base storage: entries are kept in SQLite, so FAQs are
+imported once and shared by every session and across restarts. FAQ text is
+indexed with FTS5 (when the SQLite build provides it) for full-text search.
+"""
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from typing import Callable, Dict, List
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kb_items (
+    rowid INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    type TEXT,
+    question TEXT,
+    answer TEXT,
+    payload BLOB NOT NULL
+);
+"""
+
+# Entry fields holding a timestamp (stored as ISO strings)
+TIMESTAMP_FIELDS = ('uploaded_at',)
+
+def _json_default(value):
+    """JSON form of entry values json can't encode itself"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if hasattr(value, 'to_dict'):
+        # DataFrame (workbook sheet previews): a list of row records, blanks as null
+        return value.astype(object).where(value.notna(), None).to_dict('records')
+    if hasattr(value, 'item'):
+        # numpy scalar
+        return value.item()
+    raise TypeError(f"Can't store {type(value).__name__} in the knowledge base")
+
+def encode_entry(entry: Dict) -> str:
+    """Serialize an entry: timestamps as ISO strings, previews as records"""
+    return json.dumps(entry, default=_json_default, ensure_ascii=False)
+
+def decode_entry(payload) -> Dict:
+    """Inverse of encode_entry; timestamps come back as datetimes, previews stay records"""
+    entry = json.loads(payload)
+    if not isinstance(entry, dict):
+        raise ValueError("Knowledge base entries are JSON objects")
+    for field in TIMESTAMP_FIELDS:
+        if isinstance(entry.get(field), str):
+            entry[field] = datetime.fromisoformat(entry[field])
+    return entry
+
+# External-content FTS5 table over the FAQ rows of kb_items, kept in sync by
+# triggers. Mark categories (M*) are token characters so Devanagari vowel
+# signs don't split words.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS kb_fts USING fts5(
+    question, answer,
+    content='kb_items', content_rowid='rowid',
+    tokenize="unicode61 remove_diacritics 2 categories 'L* N* Co M*'"
+);
+CREATE TRIGGER IF NOT EXISTS kb_items_fts_insert AFTER INSERT ON kb_items WHEN new.type = 'faq' BEGIN
+    INSERT INTO kb_fts(rowid, question, answer) VALUES (new.rowid, new.question, new.answer);
+END;
+CREATE TRIGGER IF NOT EXISTS kb_items_fts_delete AFTER DELETE ON kb_items WHEN old.type = 'faq' BEGIN
+    INSERT INTO kb_fts(kb_fts, rowid, question, answer) VALUES ('delete', old.rowid, old.question, old.answer);
+END;
+"""
+
+class KnowledgeBaseStore(MutableMapping):
+    """
+    Dict-like knowledge base ({key: entry}) backed by SQLite.
+    Entries are held in memory for reads and written through to the database,
+    one transaction per write (update() writes a whole batch at once). Entries
+    are stored as JSON (see encode_entry); rows that don't decode are left in
+    the database but not loaded.
+    `version` counts writes, so caches of derived answers can tell when the
+    knowledge base changed.
+    A write is split in two for large batches built off the script thread:
+    write() persists and indexes a batch (the slow part) while readers carry
+    on, publish() then makes it visible in one cheap step; update() does both.
+    FAQ indexes (add/remove by id) are kept in sync with the FAQs: the
+    keyword index given at construction, and any attached later with
+    add_index() until remove_index() (the semantic one, while enabled). An
+    index with a sync() method is given the full FAQ set through it instead
+    of add().
+    Thread-safe; meant to be shared by all sessions of one server process.
+    """
+    def __init__(self, path: str, faq_index=None):
+        self.path = path
+        self.faq_index = faq_index
+        self._indexes = [faq_index] if faq_index is not None else []
+        self.version = 0
+        # _lock guards the in-memory entries and reads; _write_lock serializes writers
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        # Entries written but not yet published
+        self._pending: Dict[str, Dict] = {}
+        # Autocommit mode: transactions are opened explicitly in _transaction()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.fts_enabled = self._create_fts()
+        # Writers get their own connection, so reads don't wait for a commit (WAL)
+        self._write_conn = self._conn if path == ':memory:' else sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+
+        self._entries: Dict[str, Dict] = {}
+        for key, payload in self._conn.execute("SELECT key, payload FROM kb_items ORDER BY rowid"):
+            try:
+                self._entries[key] = decode_entry(payload)
+            except (ValueError, TypeError):
+                # Damaged row (or one written in another format): skip it
+                continue
+        faqs = {key: entry for key, entry in self._entries.items() if entry.get('type') == 'faq'}
+        for index in self._indexes:
+            getattr(index, 'sync', index.add)(faqs)
+
+    def _create_fts(self) -> bool:
+        try:
+            self._conn.executescript(FTS_SCHEMA)
+            return True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search falls back to the FAQ index
+            return False
+
+    @contextmanager
+    def _transaction(self):
+        self._write_conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._write_conn
+        except BaseException:
+            self._write_conn.execute("ROLLBACK")
+            raise
+        self._write_conn.execute("COMMIT")
+
+    def __getitem__(self, key: str) -> Dict:
+        return self._entries[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self):
+        # Iterate over a snapshot: other sessions may write meanwhile
+        with self._lock:
+            return iter(list(self._entries))
+
+    def items(self):
+        with self._lock:
+            return list(self._entries.items())
+
+    def values(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def __setitem__(self, key: str, entry: Dict):
+        self.update({key: entry})
+
+    def __delitem__(self, key: str):
+        self.delete([key])
+
+    def update(self, entries=(), **kwargs):
+        """Insert or replace a batch of entries in one transaction"""
+        self.publish(self.write(dict(entries, **kwargs)))
+
+    def write(self, entries: Dict[str, Dict], fresh_keys: Callable[[int, set], List[str]] = None) -> Dict[str, Dict]:
+        """
+        Persist and index a batch of entries in one transaction without
+        publishing it (any thread). With `fresh_keys(count, taken)`, entries
+        whose key is already taken (published or pending) are given new keys
+        instead of replacing what is there. Returns the batch as written.
+        """
+        if not entries:
+            return {}
+        with self._write_lock:
+            if fresh_keys is not None:
+                with self._lock:
+                    taken = set(self._pending) | set(self._entries)
+                collisions = [key for key in entries if key in taken]
+                if collisions:
+                    entries = dict(entries)
+                    for old_key, new_key in zip(collisions, fresh_keys(len(collisions), taken | set(entries))):
+                        entries[new_key] = entries.pop(old_key)
+            rows = [
+                (
+                    key,
+                    entry.get('type'),
+                    entry.get('question') if entry.get('type') == 'faq' else None,
+                    entry.get('answer') if entry.get('type') == 'faq' else None,
+                    encode_entry(entry)
+                )
+                for key, entry in entries.items()
+            ]
+            with self._transaction() as conn:
+                conn.executemany("DELETE FROM kb_items WHERE key = ?", [(key,) for key in entries])
+                conn.executemany(
+                    "INSERT INTO kb_items (key, type, question, answer, payload) VALUES (?, ?, ?, ?, ?)", rows
+                )
+            with self._lock:
+                self._pending.update(entries)
+            # Index lookups check membership, so unpublished FAQs are never answered
+            faqs = {key: entry for key, entry in entries.items() if entry.get('type') == 'faq'}
+            for index in self._indexes:
+                index.remove([key for key in entries if key not in faqs and key in index])
+                index.add(faqs)
+        return entries
+
+    def publish(self, entries: Dict[str, Dict]):
+        """Make a batch returned by write() visible to readers"""
+        if not entries:
+            return
+        with self._lock:
+            self._entries.update(entries)
+            for key in entries:
+                self._pending.pop(key, None)
+            self.version += 1
+
+    def add_index(self, index):
+        """Keep another FAQ index in sync from now on, starting from the current FAQs"""
+        with self._write_lock:
+            with self._lock:
+                current = {**self._entries, **self._pending}
+            faqs = {key: entry for key, entry in current.items() if entry.get('type') == 'faq'}
+            getattr(index, 'sync', index.add)(faqs)
+            self._indexes.append(index)
+
+    def remove_index(self, index):
+        """Stop keeping an index added with add_index() in sync"""
+        with self._write_lock:
+            self._indexes = [other for other in self._indexes if other is not index]
+
+    def delete(self, keys: List[str]):
+        """Delete a batch of entries in one transaction (unknown keys raise KeyError)"""
+        with self._write_lock:
+            missing = [key for key in keys if key not in self._entries]
+            if missing:
+                raise KeyError(missing[0])
+            with self._transaction() as conn:
+                conn.executemany("DELETE FROM kb_items WHERE key = ?", [(key,) for key in keys])
+            with self._lock:
+                for key in keys:
+                    del self._entries[key]
+                self.version += 1
+            for index in self._indexes:
+                index.remove(keys)
+
+    def matching_keys(self, match: str) -> set:
+        """Keys of the FAQs matching an FTS5 MATCH expression, unranked (cheap for phrase checks)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM kb_items WHERE rowid IN (SELECT rowid FROM kb_fts WHERE kb_fts MATCH ?)",
+                (match,)
+            ).fetchall()
+        return {key for key, in rows if key in self._entries}
+
+    def close(self):
+        with self._write_lock, self._lock:
+            if self._write_conn is not self._conn:
+                self._write_conn.close()
+            self._conn.close()
@@ -0,0 +1,286 @@
+"""
+Language identification for customer messages: English, Hindi, Marathi and
+romanized Hindi (Hinglish). The script decides between Devanagari and Latin
+text; within a script, a character n-gram Naive Bayes model trained on
+sample support messages separates the two languages.
+"""
+import math
+import re
+from typing import Dict, Iterable, List
+
+# Devanagari block; search() stops at the first match
+DEVANAGARI_PATTERN = re.compile(r'[\u0900-\u097F]')
+LATIN_PATTERN = re.compile(r'[a-zA-Z]')
+WORD_PATTERN = re.compile(r'[a-z\u0900-\u097F]+')
+# Only the start of a message is classified, bounding the cost per message
+# (about 50 us at this length); a few words are enough to tell languages apart
+MAX_CHARS = 48
+
+# Training messages per language: the same support requests in each
+TRAINING_SAMPLES = {
+    'Hindi': """
+        मेरा ऑर्डर अभी तक नहीं आया है
+        मुझे अपना पैसा वापस चाहिए
+        रिफंड कब तक मिलेगा
+        आपका ऑफिस कहाँ है
+        मैं अपना पासवर्ड भूल गया हूँ
+        यह प्रोडक्ट काम नहीं कर रहा है
+        क्या इस पर वारंटी है
+        मुझे ग्राहक सेवा से बात करनी है
+        कृपया मेरी मदद कीजिए
+        मेरा फोन चालू नहीं हो रहा
+        डिलीवरी में कितने दिन लगेंगे
+        मैं अपना ऑर्डर रद्द करना चाहता हूँ
+        भुगतान करने के बाद भी ऑर्डर नहीं दिखा
+        आपका फोन नंबर क्या है
+        इंस्टॉल कैसे करें
+        सॉफ्टवेयर इंस्टॉल करने में समस्या आ रही है
+        मुझे बिल की कॉपी चाहिए
+        क्या आप घर पर सर्विस देते हैं
+        मेरे खाते से दो बार पैसे कट गए
+        सामान टूटा हुआ मिला है
+        मुझे नया पता जोड़ना है
+        कीमत कितनी है
+        यह कब तक ठीक होगा
+        मैंने कल शिकायत दर्ज की थी लेकिन कोई जवाब नहीं मिला
+        आप लोग बहुत देर कर रहे हैं
+        क्या मैं उत्पाद बदल सकता हूँ
+        मुझे ईमेल पर जानकारी भेज दीजिए
+        लैपटॉप की बैटरी जल्दी खत्म हो जाती है
+        हमें आपकी सेवा पसंद आई धन्यवाद
+        यह सुविधा किस शहर में उपलब्ध है
+        मेरी शिकायत का स्टेटस बताइए
+        ऐप बार बार बंद हो जाता है
+        मैं किससे संपर्क करूँ
+        आपने गलत सामान भेजा है
+        कृपया जल्दी से जल्दी समाधान करें
+        मुझे अपने खाते की जानकारी बदलनी है
+        क्या मुझे छूट मिल सकती है
+        मेरा सवाल अभी भी हल नहीं हुआ
+        वापसी की प्रक्रिया क्या है
+        मैं आपकी दुकान पर आना चाहता हूँ
+    """,
+    'Marathi': """
+        माझी ऑर्डर अजून आलेली नाही
+        मला माझे पैसे परत हवे आहेत
+        रिफंड कधी मिळेल
+        तुमचे ऑफिस कुठे आहे
+        मी माझा पासवर्ड विसरलो आहे
+        हे प्रॉडक्ट काम करत नाही
+        यावर वॉरंटी आहे का
+        मला ग्राहक सेवेशी बोलायचे आहे
+        कृपया मला मदत करा
+        माझा फोन चालू होत नाही
+        डिलिव्हरीला किती दिवस लागतील
+        मला माझी ऑर्डर रद्द करायची आहे
+        पैसे भरल्यानंतरही ऑर्डर दिसत नाही
+        तुमचा फोन नंबर काय आहे
+        इन्स्टॉल कसे करायचे
+        सॉफ्टवेअर इन्स्टॉल करताना अडचण येत आहे
+        मला बिलाची प्रत पाहिजे
+        तुम्ही घरी येऊन सेवा देता का
+        माझ्या खात्यातून दोनदा पैसे कापले गेले
+        वस्तू तुटलेली मिळाली आहे
+        मला नवीन पत्ता जोडायचा आहे
+        किंमत किती आहे
+        हे कधीपर्यंत दुरुस्त होईल
+        मी काल तक्रार नोंदवली होती पण काहीच उत्तर मिळाले नाही
+        तुम्ही लोक खूप उशीर करत आहात
+        मी उत्पादन बदलू शकतो का
+        मला ईमेलवर माहिती पाठवा
+        लॅपटॉपची बॅटरी लवकर संपते
+        आम्हाला तुमची सेवा आवडली धन्यवाद
+        ही सुविधा कोणत्या शहरात उपलब्ध आहे
+        माझ्या तक्रारीची स्थिती सांगा
+        ॲप सारखे बंद होते
+        मी कोणाशी संपर्क साधू
+        तुम्ही चुकीची वस्तू पाठवली आहे
+        कृपया लवकरात लवकर उपाय करा
+        मला माझ्या खात्याची माहिती बदलायची आहे
+        मला सवलत मिळू शकते का
+        माझा प्रश्न अजूनही सुटलेला नाही
+        परत करण्याची प्रक्रिया काय आहे
+        मला तुमच्या दुकानात यायचे आहे
+    """,
+    'Hinglish': """
+        mera order abhi tak nahi aaya hai
+        mujhe mera paisa wapas chahiye
+        refund kab tak milega
+        aapka office kahan hai
+        main apna password bhool gaya hoon
+        ye product kaam nahi kar raha
+        kya iske upar warranty hai
+        mujhe customer care se baat karni hai
+        please meri help karo
+        mera phone on nahi ho raha
+        delivery me kitne din lagenge
+        mujhe apna order cancel karna hai
+        payment karne ke baad bhi order nahi dikha
+        aapka phone number kya hai
+        install kaise kare
+        software install karne me problem aa rahi hai
+        mujhe bill ki copy chahiye
+        kya aap ghar par service dete ho
+        mere account se do baar paise kat gaye
+        saaman toota hua mila hai
+        mujhe naya address add karna hai
+        price kitni hai
+        ye kab tak theek hoga
+        maine kal complaint ki thi lekin koi jawab nahi mila
+        aap log bahut late kar rahe ho
+        kya main product exchange kar sakta hoon
+        mujhe email pe details bhej do
+        laptop ki battery jaldi khatam ho jaati hai
+        hume aapki service achhi lagi thanks
+        ye suvidha kis city me available hai
+        meri complaint ka status batao
+        app baar baar band ho jata hai
+        main kisse contact karu
+        aapne galat saaman bheja hai
+        jaldi se solution karo yaar
+        mujhe apne account ki details badalni hai
+        kya mujhe discount mil sakta hai
+        mera sawal abhi bhi solve nahi hua
+        return ka process kya hai
+        bhai mera refund kab aayega
+    """,
+    'English': """
+        my order has not arrived yet
+        i want my money back
+        when will i get my refund
+        where is your office located
+        i forgot my password
+        this product is not working
+        is there a warranty on this
+        i want to talk to customer care
+        please help me
+        my phone does not turn on
+        how many days does delivery take
+        i want to cancel my order
+        the order is not showing after payment
+        what is your phone number
+        how to install
+        i am having trouble installing the software
+        i need a copy of my invoice
+        do you provide service at home
+        money was deducted twice from my account
+        the item arrived broken
+        i need to add a new address
+        what is the price
+        how long will the repair take
+        i filed a complaint yesterday but got no reply
+        you people are taking too long
+        can i exchange the product
+        please send me the details by email
+        the laptop battery drains quickly
+        we liked your service thanks
+        which cities is this available in
+        tell me the status of my complaint
+        the app keeps crashing
+        who should i contact
+        you sent me the wrong item
+        please resolve this as soon as possible
+        i need to change my account details
+        can i get a discount
+        my issue is still not resolved
+        what is the return process
+        office address
+        refund please
+        my device broke
+        contact number
+    """,
+}
+
+def char_ngrams(text: str, limit: int = MAX_CHARS, orders=(1, 2, 3)) -> List[str]:
+    """Character n-grams of the lowercased words of text[:limit], padded with spaces at word edges"""
+    padded = ' ' + ' '.join(WORD_PATTERN.findall(text[:limit].lower())) + ' '
+    return [padded[i:i + n] for n in orders for i in range(len(padded) - n + 1)]
+
+class NaiveBayesPair:
+    """
+    Two-class multinomial Naive Bayes over character n-grams, reduced to one
+    log-likelihood ratio per n-gram, so scoring a message is one dictionary
+    lookup per n-gram. score() > 0 favours `positive`.
+    """
+    def __init__(self, positive: Iterable[str], negative: Iterable[str], alpha: float = 0.5):
+        positive_counts = self._counts(positive)
+        negative_counts = self._counts(negative)
+        vocabulary = positive_counts.keys() | negative_counts.keys()
+        positive_total = sum(positive_counts.values()) + alpha * len(vocabulary)
+        negative_total = sum(negative_counts.values()) + alpha * len(vocabulary)
+        self.weights: Dict[str, float] = {
+            gram: math.log((positive_counts.get(gram, 0) + alpha) / positive_total)
+            - math.log((negative_counts.get(gram, 0) + alpha) / negative_total)
+            for gram in vocabulary
+        }
+        # N-grams seen in neither class
+        self.unseen = math.log(negative_total / positive_total)
+
+    @staticmethod
+    def _counts(texts: Iterable[str]) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for text in texts:
+            for gram in char_ngrams(text, limit=None):
+                counts[gram] = counts.get(gram, 0) + 1
+        return counts
+
+    def score(self, text: str) -> float:
+        """Log-odds of `positive` over `negative` (equal priors)"""
+        get = self.weights.get
+        unseen = self.unseen
+        return sum(get(gram, unseen) for gram in char_ngrams(text))
+
+class LanguageDetector:
+    """
+    Script-aware language identification. Devanagari text is Hindi or
+    Marathi; Latin text is English unless the Hinglish model is confident
+    by `hinglish_margin` (log-odds), since plain English is far more common;
+    text in neither script is `default`.
+    """
+    def __init__(self, samples: Dict[str, str] = None, hinglish_margin: float = 2.0, default: str = 'English'):
+        samples = samples or TRAINING_SAMPLES
+        lines = {language: [line.strip() for line in text.strip().splitlines() if line.strip()] for language, text in samples.items()}
+        self.marathi_model = NaiveBayesPair(lines['Marathi'], lines['Hindi'])
+        self.hinglish_model = NaiveBayesPair(lines['Hinglish'], lines['English'])
+        self.hinglish_margin = hinglish_margin
+        self.default = default
+
+    def detect(self, text: str) -> str:
+        """Language of one message: 'English', 'Hindi', 'Marathi' or 'Hinglish'"""
+        if not isinstance(text, str):
+            return self.default
+        if DEVANAGARI_PATTERN.search(text):
+            return 'Marathi' if self.marathi_model.score(text) > 0 else 'Hindi'
+        if LATIN_PATTERN.search(text):
+            return 'Hinglish' if self.hinglish_model.score(text) > self.hinglish_margin else 'English'
+        return self.default
+
+    def detect_many(self, texts: Iterable) -> List[str]:
+        """Languages of many messages (e.g. a DataFrame column); repeated texts are classified once"""
+        cache: Dict[str, str] = {}
+        languages = []
+        for text in texts:
+            language = cache.get(text) if isinstance(text, str) else None
+            if language is None:
+                language = self.detect(text)
+                if isinstance(text, str):
+                    cache[text] = language
+            languages.append(language)
+        return languages
+
+_detector = None
+
+def get_detector() -> LanguageDetector:
+    """Shared detector trained on TRAINING_SAMPLES (built on first use)"""
+    global _detector
+    if _detector is None:
+        _detector = LanguageDetector()
+    return _detector
+
+def detect_language(text: str) -> str:
+    """Language of one message (see LanguageDetector.detect)"""
+    return get_detector().detect(text)
+
+def detect_many(texts: Iterable) -> List[str]:
+    """Languages of many messages (see LanguageDetector.detect_many)"""
+    return get_detector().detect_many(texts)
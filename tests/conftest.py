@@ -0,0 +1,45 @@
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'app (5).py')
+
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The Streamlit app script loaded as a module (Streamlit runs it in bare mode)"""
+    data_dir = tmp_path_factory.mktemp('app')
+    os.environ['KB_DB_PATH'] = ':memory:'
+    os.environ['SEMANTIC_INDEX_PATH'] = str(data_dir / 'vectors.npz')
+    os.environ['DATASET_CACHE_DIR'] = str(data_dir / 'dataset_cache')
+    spec = importlib.util.spec_from_file_location('support_app', APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def query_log():
+    """A random query log with categorical dimensions (some values missing) and ticket flags"""
+    rng = np.random.default_rng(7)
+    size = 5000
+    values = {
+        'business_unit': ['Retail', 'SMB', 'Enterprise', 'Gov', None],
+        'communication_channel': ['Email', 'Phone', 'WhatsApp', 'Chat'],
+        'language': ['English', 'Hindi', 'Marathi', None],
+        'query_category': ['Billing', 'Technical', 'Delivery', 'Product Information', 'Complaint'],
+    }
+    frame = pd.DataFrame({
+        dim: pd.Categorical(rng.choice(np.array(options, dtype=object), size))
+        for dim, options in values.items()
+    })
+    frame['ticket_created'] = rng.random(size) < 0.4
+    frame['query_date'] = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 90, size), unit='D')
+    return frame
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+DIMS = ['query_category', 'communication_channel', 'business_unit', 'language']
+
+
+def reference_stats(frame, dim):
+    """The per-group aggregation dimension_stats replaced"""
+    grouped = frame.groupby(dim, observed=True).agg(
+        count=('ticket_created', 'size'),
+        tickets=('ticket_created', lambda flags: int(flags.sum())),
+    )
+    grouped['resolution_rate'] = grouped.apply(lambda row: (row['count'] - row['tickets']) / row['count'] * 100, axis=1)
+    grouped['escalation_rate'] = grouped.apply(lambda row: row['tickets'] / row['count'] * 100, axis=1)
+    return grouped.astype({'count': 'int64', 'tickets': 'int64'})
+
+
+def assert_same_stats(actual, expected):
+    pd.testing.assert_frame_equal(
+        actual.sort_index(), expected.sort_index(), check_index_type=False, check_categorical=False
+    )
+
+
+def test_raw_rows_match_groupby(app, query_log):
+    stats = app.dimension_stats(query_log, DIMS)
+    for dim in DIMS:
+        assert_same_stats(stats[dim], reference_stats(query_log, dim))
+
+
+def test_cube_matches_raw_rows(app, query_log):
+    cube = app.build_metrics_cube(query_log)
+    from_cube = app.dimension_stats(cube, DIMS)
+    from_rows = app.dimension_stats(query_log, DIMS)
+    for dim in DIMS:
+        assert_same_stats(from_cube[dim], from_rows[dim])
+
+
+def test_filtered_subset_drops_empty_groups(app, query_log):
+    subset = query_log[query_log['query_category'] == 'Billing']
+    stats = app.dimension_stats(subset, ['query_category', 'business_unit'])
+    assert list(stats['query_category'].index) == ['Billing']
+    assert_same_stats(stats['business_unit'], reference_stats(subset, 'business_unit'))
+
+
+def test_plain_object_columns(app, query_log):
+    frame = query_log.astype({'query_category': object})
+    stats = app.dimension_stats(frame, ['query_category'])
+    assert_same_stats(stats['query_category'], reference_stats(query_log, 'query_category'))
+    assert stats['query_category']['count'].sum() == len(frame)
@@ -0,0 +1,120 @@
+import threading
+
+import numpy as np
+import pytest
+
+VOCABULARY = [
+    'refund', 'warranty', 'delivery', 'password', 'battery', 'invoice', 'discount', 'install',
+    'account', 'payment', 'address', 'office', 'charger', 'screen', 'return', 'order',
+]
+
+
+def make_entries(rng, keys):
+    return {
+        key: {
+            'type': 'faq',
+            'question': ' '.join(rng.choice(VOCABULARY, rng.integers(2, 7))),
+            'answer': ' '.join(rng.choice(VOCABULARY, rng.integers(3, 12))),
+        }
+        for key in keys
+    }
+
+
+def build_incrementally(app, rng, compact_ratio):
+    """An index fed by batches, replacements and deletes, with the entries it should end up holding"""
+    index = app.FAQIndex(compact_ratio=compact_ratio)
+    entries = {}
+    steps = [
+        ('add', [f'F{i}' for i in range(0, 120)]),
+        ('remove', [f'F{i}' for i in range(0, 120, 3)]),
+        ('add', [f'F{i}' for i in range(120, 200)]),
+        ('add', [f'F{i}' for i in range(100, 140)]),  # replaces live and deleted ids
+        ('remove', [f'F{i}' for i in range(150, 190)] + ['missing']),
+        ('add', [f'F{i}' for i in range(200, 230)]),
+    ]
+    for action, keys in steps:
+        if action == 'add':
+            batch = make_entries(rng, keys)
+            index.add(batch)
+            entries.update(batch)
+        else:
+            index.remove(keys)
+            for key in keys:
+                entries.pop(key, None)
+    return index, entries
+
+
+def assert_same_results(incremental, fresh):
+    assert len(incremental) == len(fresh)
+    limit = len(fresh) + 1
+    queries = [[[term]] for term in VOCABULARY] + [
+        [['refund'], ['payment']],
+        [['warranty', 'battery']],
+        [['pass*']],
+        [['refnud']],  # corrected to 'refund'
+    ]
+    for clauses in queries:
+        found, total = incremental.find(clauses, limit=limit)
+        expected, expected_total = fresh.find(clauses, limit=limit)
+        assert total == expected_total
+        expected = dict(expected)
+        assert dict(found).keys() == expected.keys()
+        for key, score in found:
+            assert score == pytest.approx(expected[key])
+    for query in ['refund for my order', 'battery warranty', 'instal the charger', 'unrelated words']:
+        found = {key: (score, confidence) for key, score, confidence in incremental.search(query, top_k=limit)}
+        expected = {key: (score, confidence) for key, score, confidence in fresh.search(query, top_k=limit)}
+        assert found.keys() == expected.keys()
+        for key in found:
+            assert found[key] == pytest.approx(expected[key])
+
+
+@pytest.mark.parametrize('compact_ratio', [1.0, 0.25, 0.0])
+def test_incremental_index_equals_fresh_build(app, compact_ratio):
+    rng = np.random.default_rng(11)
+    incremental, entries = build_incrementally(app, rng, compact_ratio)
+    fresh = app.FAQIndex()
+    fresh.add(entries)
+    assert set(entries) == {key for key in entries if key in incremental}
+    assert 'F0' not in incremental and 'missing' not in incremental
+    assert_same_results(incremental, fresh)
+    incremental.compact()
+    assert_same_results(incremental, fresh)
+
+
+def test_deleted_terms_are_forgotten(app):
+    index = app.FAQIndex(compact_ratio=1.0)
+    index.add({'F1': {'question': 'zebra stripes', 'answer': 'yes'}, 'F2': {'question': 'refund', 'answer': 'ok'}})
+    index.remove(['F1'])
+    assert not index.knows('zebra')
+    assert index.find([['zebra']]) == ([], 0)
+    assert index.expand_prefix('zeb') == []
+
+
+def test_searches_during_a_batch_add(app):
+    rng = np.random.default_rng(5)
+    index = app.FAQIndex()
+    first = make_entries(rng, [f'F{i}' for i in range(500)])
+    second = make_entries(rng, [f'F{i}' for i in range(500, 5500)])
+    index.add(first)
+    errors = []
+    done = threading.Event()
+
+    def search():
+        while not done.is_set():
+            try:
+                found, total = index.find([['refund']], limit=5)
+                assert all(key in index for key, _ in found)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    index.add(second)
+    done.set()
+    searcher.join()
+    assert not errors
+    fresh = app.FAQIndex()
+    fresh.add({**first, **second})
+    assert_same_results(index, fresh)
@@ -0,0 +1,62 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def cube(app, query_log):
+    return app.build_metrics_cube(query_log)
+
+
+@pytest.fixture
+def index(app, cube):
+    return app.FilterIndex(cube, app.FILTER_DIMENSIONS)
+
+
+def isin_mask(frame, selections):
+    mask = np.ones(len(frame), dtype=bool)
+    for dim, selected in selections.items():
+        mask &= frame[dim].isin(selected).to_numpy()
+    return mask
+
+
+def test_masks_equal_isin(app, cube, index):
+    rng = np.random.default_rng(3)
+    for _ in range(50):
+        selections = {}
+        for dim in app.FILTER_DIMENSIONS:
+            options = list(cube[dim].cat.categories) + [np.nan]
+            chosen = rng.choice(len(options), rng.integers(0, len(options) + 1), replace=False)
+            selections[dim] = [options[i] for i in chosen]
+        np.testing.assert_array_equal(index.mask(selections), isin_mask(cube, selections))
+
+
+@pytest.mark.parametrize('dim', ['business_unit', 'language'])
+def test_missing_values_are_selectable(cube, index, dim):
+    selections = {dim: [np.nan]}
+    mask = index.mask(selections)
+    assert mask.any()
+    np.testing.assert_array_equal(mask, cube[dim].isna().to_numpy())
+
+
+def test_unknown_and_empty_selections_match_nothing(cube, index):
+    assert not index.mask({'business_unit': ['Unknown']}).any()
+    assert not index.mask({'business_unit': []}).any()
+    assert index.mask({}).all()
+
+
+def test_cached_masks_are_read_only(index):
+    selections = {'communication_channel': ['Email', 'Phone']}
+    mask = index.mask(selections)
+    assert index.mask({'communication_channel': ['Phone', 'Email']}) is mask
+    with pytest.raises(ValueError):
+        mask[0] = not mask[0]
+
+
+def test_sizes_off_byte_boundaries(app):
+    for size in [1, 7, 8, 9, 17]:
+        frame = pd.DataFrame({'channel': pd.Categorical(list(itertools.islice(itertools.cycle('ABC'), size)))})
+        index = app.FilterIndex(frame, ['channel'])
+        np.testing.assert_array_equal(index.mask({'channel': ['B']}), isin_mask(frame, {'channel': ['B']}))
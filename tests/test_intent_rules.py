@@ -0,0 +1,41 @@
+import json
+import os
+
+import pytest
+
+FALLBACK = {'response': 'Connecting you to support.', 'category': 'Complex Query', 'confidence': 0.4}
+REFUND = {'intent': 'refund', 'keywords': ['refund', 'money back'], 'response': 'Refunds take 5 days.',
+          'category': 'Billing', 'confidence': 0.8}
+
+
+def write_rules(tmp_path, rules):
+    path = tmp_path / 'intent_rules.json'
+    path.write_text(rules if isinstance(rules, str) else json.dumps(rules), encoding='utf-8')
+    return str(path)
+
+
+def test_shipped_rules_load(app):
+    matcher = app.IntentMatcher.from_file(os.path.join(os.path.dirname(app.__file__), 'intent_rules.json'))
+    assert matcher.intents
+
+
+def test_valid_rules_match(app, tmp_path):
+    matcher = app.IntentMatcher.from_file(write_rules(tmp_path, {'intents': [REFUND], 'fallback': FALLBACK}))
+    assert matcher.match('i want my money back')['intent'] == 'refund'
+    assert matcher.match('hello there') == FALLBACK
+
+
+@pytest.mark.parametrize('rules, problem', [
+    ('{"intents": [', 'not valid JSON'),
+    ([REFUND], '"intents" list'),
+    ({'intents': [dict(REFUND, keywords='refund')], 'fallback': FALLBACK}, 'invalid keywords'),
+    ({'intents': [dict(REFUND, keywords=['refund', ' '])], 'fallback': FALLBACK}, 'invalid keywords'),
+    ({'intents': [dict(REFUND, confidence='high')], 'fallback': FALLBACK}, 'invalid confidence'),
+    ({'intents': [dict(REFUND, confidence=1.5)], 'fallback': FALLBACK}, 'invalid confidence'),
+    ({'intents': [{'intent': 'refund'}], 'fallback': FALLBACK}, 'lacks keywords'),
+    ({'intents': [REFUND], 'fallback': {}}, 'Fallback rule'),
+    ({'intents': ['refund'], 'fallback': FALLBACK}, 'not an object'),
+])
+def test_malformed_rules_raise_value_error(app, tmp_path, rules, problem):
+    with pytest.raises(ValueError, match=problem):
+        app.IntentMatcher.from_file(write_rules(tmp_path, rules))
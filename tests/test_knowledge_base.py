@@ -0,0 +1,143 @@
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from knowledge_base import KnowledgeBaseStore
+
+
+class RecordingIndex:
+    """Minimal FAQ index: the ids it was given"""
+    def __init__(self):
+        self.keys = set()
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def add(self, entries):
+        self.keys.update(entries)
+
+    def remove(self, keys):
+        self.keys.difference_update(keys)
+
+
+def faq(question, answer='See the manual.'):
+    return {'type': 'faq', 'question': question, 'answer': answer, 'category': 'General'}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = KnowledgeBaseStore(str(tmp_path / 'kb.db'), faq_index=RecordingIndex())
+    yield store
+    store.close()
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / 'kb.db')
+    uploaded = datetime(2024, 5, 1, 9, 30)
+    preview = pd.DataFrame({'Question': ['How?', None], 'Answer': ['Like this', 'Done'], 'Rows': np.array([1, 2])})
+    store = KnowledgeBaseStore(path)
+    store.update({
+        'FAQ_1': faq('How do I get a refund?', 'Within 30 days.'),
+        'sheet.xlsx': {'type': 'excel', 'uploaded_at': uploaded, 'total_rows': np.int64(2),
+                       'sheets_data': {'Sheet1': {'preview': preview}}},
+    })
+    store.close()
+
+    reopened = KnowledgeBaseStore(path)
+    assert reopened['FAQ_1'] == faq('How do I get a refund?', 'Within 30 days.')
+    workbook = reopened['sheet.xlsx']
+    assert workbook['uploaded_at'] == uploaded
+    assert workbook['total_rows'] == 2
+    assert workbook['sheets_data']['Sheet1']['preview'] == [
+        {'Question': 'How?', 'Answer': 'Like this', 'Rows': 1},
+        {'Question': None, 'Answer': 'Done', 'Rows': 2},
+    ]
+    reopened.close()
+
+
+def test_damaged_rows_are_skipped(tmp_path):
+    path = str(tmp_path / 'kb.db')
+    store = KnowledgeBaseStore(path)
+    store.update({'FAQ_1': faq('Where is the office?')})
+    store.close()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO kb_items (key, type, payload) VALUES ('broken', 'text', 'not json')")
+    conn.execute("INSERT INTO kb_items (key, type, payload) VALUES ('listed', 'text', '[1, 2]')")
+    conn.commit()
+    conn.close()
+
+    reopened = KnowledgeBaseStore(path)
+    assert list(reopened) == ['FAQ_1']
+    reopened.close()
+
+
+def test_full_text_matches_follow_writes_and_deletes(store):
+    if not store.fts_enabled:
+        pytest.skip("SQLite built without FTS5")
+    store.update({
+        'FAQ_1': faq('How do I reset my password?'),
+        'FAQ_2': faq('Where is my order?', 'Track it from your account page.'),
+        'notes.txt': {'type': 'text', 'content': 'password policy notes'},
+    })
+    assert store.matching_keys('password') == {'FAQ_1'}
+    assert store.matching_keys('"how do"') == {'FAQ_1'}
+    assert store.matching_keys('account') == {'FAQ_2'}
+    store['FAQ_1'] = faq('How do I change my email?')
+    assert store.matching_keys('password') == set()
+    assert store.matching_keys('email') == {'FAQ_1'}
+    del store['FAQ_2']
+    assert store.matching_keys('account') == set()
+
+
+def test_written_batches_stay_hidden_until_published(store):
+    if not store.fts_enabled:
+        pytest.skip("SQLite built without FTS5")
+    version = store.version
+    written = store.write({'FAQ_1': faq('Do you ship abroad?')})
+    assert 'FAQ_1' not in store
+    assert 'FAQ_1' in store.faq_index
+    assert store.matching_keys('abroad') == set()
+    assert store.version == version
+    store.publish(written)
+    assert store['FAQ_1']['question'] == 'Do you ship abroad?'
+    assert store.matching_keys('abroad') == {'FAQ_1'}
+    assert store.version == version + 1
+
+
+def test_fresh_keys_avoid_taken_ids(store):
+    store.update({'FAQ_1': faq('First')})
+    pending = store.write({'FAQ_2': faq('Second')})
+
+    def fresh_keys(count, taken):
+        return [f'FAQ_{n}' for n in range(100, 200) if f'FAQ_{n}' not in taken][:count]
+
+    written = store.write({'FAQ_1': faq('Third'), 'FAQ_2': faq('Fourth'), 'FAQ_3': faq('Fifth')}, fresh_keys=fresh_keys)
+    store.publish({**pending, **written})
+    assert store['FAQ_1']['question'] == 'First'
+    assert store['FAQ_2']['question'] == 'Second'
+    assert store['FAQ_3']['question'] == 'Fifth'
+    assert {store[key]['question'] for key in written} == {'Third', 'Fourth', 'Fifth'}
+
+
+def test_indexes_track_faqs_while_attached(store):
+    store.update({'FAQ_1': faq('One'), 'notes.txt': {'type': 'text', 'content': 'x'}})
+    late = RecordingIndex()
+    store.add_index(late)
+    assert late.keys == {'FAQ_1'}
+    store.update({'FAQ_2': faq('Two')})
+    store['FAQ_1'] = {'type': 'text', 'content': 'no longer an FAQ'}
+    assert late.keys == store.faq_index.keys == {'FAQ_2'}
+    store.remove_index(late)
+    store.update({'FAQ_3': faq('Three')})
+    assert late.keys == {'FAQ_2'}
+    assert store.faq_index.keys == {'FAQ_2', 'FAQ_3'}
+
+
+def test_deleting_unknown_keys_raises(store):
+    store.update({'FAQ_1': faq('One')})
+    with pytest.raises(KeyError):
+        store.delete(['FAQ_1', 'missing'])
+    assert 'FAQ_1' in store
@@ -0,0 +1,58 @@
+import pytest
+
+TERMS = ['payment', 'office', 'contact', 'address', 'install', 'refund', 'warranty', 'delivery']
+
+
+@pytest.fixture
+def corrector(app):
+    return app.TermCorrector(TERMS)
+
+
+@pytest.mark.parametrize('typo, term', [
+    # adjacent transpositions
+    ('paymnet', 'payment'), ('offcie', 'office'), ('conatct', 'contact'), ('adderss', 'address'),
+    ('instlal', 'install'), ('rfeund', 'refund'), ('refnud', 'refund'), ('warrnaty', 'warranty'),
+    # insertions
+    ('paymentt', 'payment'), ('offfice', 'office'), ('refuind', 'refund'),
+    # deletions
+    ('paymet', 'payment'), ('ofice', 'office'), ('adress', 'address'), ('delivry', 'delivery'),
+    # substitutions
+    ('paymant', 'payment'), ('offica', 'office'), ('contakt', 'contact'), ('refand', 'refund'),
+    # two edits in a long word
+    ('warantty', 'warranty'), ('dleiverry', 'delivery'),
+])
+def test_corrects_typos_within_the_edit_budget(corrector, typo, term):
+    assert corrector.correct(typo) == term
+
+
+def test_leaves_known_short_and_distant_words(corrector):
+    assert corrector.correct('refund') is None
+    assert corrector.correct('pay') is None
+    assert corrector.correct('zebra') is None
+    assert corrector.correct('pqrstuvw') is None
+
+
+def test_ties_go_to_the_heavier_term(app):
+    corrector = app.TermCorrector(['cart', 'card'])
+    weights = {'cart': 1, 'card': 5}
+    assert corrector.correct('carx', weights.get) == 'card'
+    weights['card'] = 0
+    assert corrector.correct('carx', weights.get) == 'cart'
+
+
+def test_added_terms_are_found(corrector):
+    assert corrector.correct('invocie') is None
+    corrector.add(['invoice'])
+    assert corrector.correct('invocie') == 'invoice'
+
+
+def test_candidates_match_a_vocabulary_scan(app):
+    vocabulary = ['payment', 'payments', 'repayment', 'pavement', 'placement', 'apartment', 'refund', 'refunds']
+    corrector = app.TermCorrector(vocabulary)
+    for word in ['paymnet', 'paymetn', 'pamyent', 'refudn', 'rfeunds', 'apratment', 'plcaement']:
+        limit = corrector.max_distance(word)
+        expected = sorted(
+            (distance, term) for term in vocabulary
+            for distance in [app.bounded_edit_distance(word, term, limit)] if distance <= limit
+        )
+        assert corrector.candidates(word) == expected